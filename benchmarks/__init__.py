@@ -0,0 +1,24 @@
+"""
+Нагрузочные тесты Yatube.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.generate --scale 0.01
+    python -m benchmarks.run --clients 8 --requests 200
+    python -m benchmarks.compare results/old.json results/new.json
+"""
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PROJECT_DIR = os.path.join(ROOT_DIR, 'yatube')
+RESULTS_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'results')
+
+
+def setup():
+    """Подключает проект так же, как manage.py."""
+    if PROJECT_DIR not in sys.path:
+        sys.path.insert(0, PROJECT_DIR)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    import django
+    django.setup()
@@ -0,0 +1,137 @@
+"""
+Одновременная отправка комментариев с обычным и настроенным SQLite.
+
+Для каждого профиля поднимается отдельный процесс с WSGI-сервером на
+фиксированном числе потоков, и --clients вошедших пользователей
+комментируют один и тот же пост:
+
+* default — настройки SQLite по умолчанию;
+* tuned   — YATUBE_SQLITE_TUNING=1: WAL, busy_timeout и транзакции
+  BEGIN IMMEDIATE с повтором при блокировке.
+
+Кроме задержек считается, сколько комментариев действительно сохранено:
+запрос, упавший на «database is locked», комментарий теряет.
+
+    python -m benchmarks.comments --threads 8 --clients 16
+"""
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+from . import RESULTS_DIR, setup
+from .run import HttpTransport, hammer, sample_objects, summarize
+from .server import running_server
+
+PROFILES = {
+    'default': {},
+    'tuned': {'YATUBE_SQLITE_TUNING': '1'},
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument(
+        '--prefix', default='bench',
+        help='Префикс пользователей из benchmarks.generate.'
+    )
+    parser.add_argument('--output')
+    return parser.parse_args(argv)
+
+
+def journal_mode(path, mode=None):
+    """Текущий режим журнала файла базы; с mode — сначала меняет его."""
+    with sqlite3.connect(path) as database:
+        if mode is not None:
+            database.execute(f'PRAGMA journal_mode = {mode}')
+        return database.execute('PRAGMA journal_mode').fetchone()[0]
+
+
+def run_profile(args, name, env, users, path):
+    from django.db import connection
+
+    from posts.models import Comment
+
+    before = Comment.objects.count()
+    with running_server(args.port, args.threads, env) as base_url:
+        transport = HttpTransport(base_url)
+        clients = [transport.client(user) for user in users]
+        latencies, statuses, elapsed = hammer(
+            transport, clients, path, args.requests,
+            data={'text': 'Комментарий из бенчмарка'},
+        )
+    result = summarize(latencies, statuses, elapsed, {}, {})
+    del result['queries_per_request']
+    result['saved'] = Comment.objects.count() - before
+    # Выйти из WAL можно, только когда других соединений с базой нет.
+    connection.close()
+    print(
+        f'{name:<8} {result["throughput_rps"]:>9} rps  '
+        f'p50 {result["p50_ms"]:>7} ms  p95 {result["p95_ms"]:>7} ms  '
+        f'ошибок {result["errors"]}  '
+        f'сохранено {result["saved"]} из {result["requests"]}'
+    )
+    return result
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup()
+
+    from django.contrib.auth import get_user_model
+    from django.db import connection
+    from django.urls import reverse
+
+    from .generate import PASSWORD
+
+    if connection.vendor != 'sqlite':
+        raise SystemExit('Бенчмарк сравнивает режимы SQLite')
+    database = connection.settings_dict['NAME']
+    author, kwargs = sample_objects()
+    path = reverse('add_comment', args=(author.username, kwargs['post_id']))
+    users = list(get_user_model().objects.filter(
+        username__startswith=args.prefix
+    ).order_by('pk')[:args.clients])
+    if len(users) < args.clients:
+        raise SystemExit(
+            f'Нужно {args.clients} пользователей с паролем {PASSWORD}: '
+            f'сначала запустите benchmarks.generate'
+        )
+    connection.close()
+    # WAL сохраняется в файле базы, поэтому исходный режим возвращается.
+    initial_mode = journal_mode(database)
+    report = {
+        'meta': {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'transport': 'wsgi-threads',
+            'threads': args.threads,
+            'clients': args.clients,
+            'requests': args.requests,
+            'database': database,
+            'path': path,
+        },
+        'results': {},
+    }
+    try:
+        for name, env in PROFILES.items():
+            journal_mode(database, initial_mode)
+            result = run_profile(args, name, env, users, path)
+            report['results'][f'{name}:add_comment'] = dict(result, path=path)
+    finally:
+        journal_mode(database, initial_mode)
+    output = args.output or os.path.join(
+        RESULTS_DIR, time.strftime('comments-%Y%m%d-%H%M%S.json')
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f'Результаты: {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Сравнение двух прогонов benchmarks.run.
+
+    python -m benchmarks.compare old.json new.json --threshold 10
+
+Код возврата 1, если p95 какого-либо URL вырос больше чем на --threshold
+процентов или выросло число SQL-запросов на ответ.
+"""
+import argparse
+import json
+
+FIELDS = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps',
+          'queries_per_request')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('old')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=10.0)
+    return parser.parse_args(argv)
+
+
+def load(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)['results']
+
+
+def change(old, new):
+    if old is None or new is None:
+        return None
+    if not old:
+        return 0.0 if not new else float('inf')
+    return (new - old) / old * 100
+
+
+def compare(old, new, threshold):
+    """Строки отчёта и список URL, где стало хуже."""
+    lines = []
+    regressions = []
+    for key in sorted(old.keys() & new.keys()):
+        cells = []
+        for field in FIELDS:
+            delta = change(old[key].get(field), new[key].get(field))
+            cells.append(
+                f'{field} {old[key].get(field)} → {new[key].get(field)}'
+                + (f' ({delta:+.1f}%)' if delta is not None else '')
+            )
+        lines.append(f'{key}: ' + ', '.join(cells))
+        p95 = change(old[key].get('p95_ms'), new[key].get('p95_ms'))
+        queries = change(
+            old[key].get('queries_per_request'),
+            new[key].get('queries_per_request'),
+        )
+        if (p95 or 0) > threshold or (queries or 0) > 0:
+            regressions.append(key)
+    for key in sorted(old.keys() ^ new.keys()):
+        lines.append(f'{key}: есть только в одном из прогонов')
+    return lines, regressions
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    lines, regressions = compare(
+        load(args.old), load(args.new), args.threshold
+    )
+    print('\n'.join(lines))
+    if regressions:
+        print('Стало хуже: ' + ', '.join(regressions))
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
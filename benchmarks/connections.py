@@ -0,0 +1,96 @@
+"""
+Запросы в секунду к главной странице с разными настройками соединений.
+
+Для каждого профиля поднимается отдельный процесс с
+yatube.settings_production и WSGI-сервером на фиксированном числе
+потоков (как gthread-воркер gunicorn):
+
+* fresh      — CONN_MAX_AGE=0, новое соединение на каждый запрос;
+* persistent — CONN_MAX_AGE=60 и проверка соединений перед запросом;
+* pool       — общий пул соединений на процесс (YATUBE_DB_POOL).
+
+    python -m benchmarks.connections --threads 8 --clients 16
+"""
+import argparse
+import json
+import os
+import time
+
+from . import PROJECT_DIR, RESULTS_DIR
+from .run import HttpTransport, hammer, summarize
+from .server import running_server
+
+
+def profiles(pool_size):
+    return {
+        'fresh': {'YATUBE_CONN_MAX_AGE': '0'},
+        'persistent': {'YATUBE_CONN_MAX_AGE': '60'},
+        'pool': {'YATUBE_DB_POOL': str(pool_size)},
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument(
+        '--pool-size', type=int,
+        help='Размер пула, по умолчанию половина --threads.'
+    )
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--output')
+    return parser.parse_args(argv)
+
+
+def run_profile(args, name, env):
+    env = dict(env, DJANGO_SETTINGS_MODULE='yatube.settings_production')
+    with running_server(args.port, args.threads, env) as base_url:
+        transport = HttpTransport(base_url)
+        clients = [transport.client(None) for _ in range(args.clients)]
+        hammer(transport, clients, args.path, args.clients * 5)
+        latencies, statuses, elapsed = hammer(
+            transport, clients, args.path, args.requests
+        )
+    result = summarize(latencies, statuses, elapsed, {}, {})
+    del result['queries_per_request']
+    print(
+        f'{name:<12} {result["throughput_rps"]:>9} rps  '
+        f'p50 {result["p50_ms"]:>7} ms  p95 {result["p95_ms"]:>7} ms  '
+        f'ошибок {result["errors"]}'
+    )
+    return result
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    pool_size = args.pool_size or max(args.threads // 2, 1)
+    report = {
+        'meta': {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'transport': 'wsgi-threads',
+            'threads': args.threads,
+            'clients': args.clients,
+            'requests': args.requests,
+            'pool_size': pool_size,
+            'database': os.getenv('POSTGRES_DB') or os.path.join(
+                PROJECT_DIR, 'db.sqlite3'
+            ),
+        },
+        'results': {},
+    }
+    for name, env in profiles(pool_size).items():
+        result = run_profile(args, name, env)
+        report['results'][f'{name}:{args.path}'] = dict(result, path=args.path)
+    output = args.output or os.path.join(
+        RESULTS_DIR, time.strftime('connections-%Y%m%d-%H%M%S.json')
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f'Результаты: {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+"""
+Генератор данных для нагрузочных тестов.
+
+Всё создаётся через bulk_create пачками, сигналы при этом не срабатывают,
+поэтому счётчики и ленты подписок пересчитываются в конце одним проходом.
+Популярность авторов, постов и подписок распределена по степенному закону.
+
+    python -m benchmarks.generate                 # 100k/1M/5M
+    python -m benchmarks.generate --scale 0.01    # 1k/10k/50k
+"""
+import argparse
+import bisect
+import random
+import time
+from array import array
+from datetime import datetime, timedelta
+
+from . import setup
+
+WORDS = (
+    'пост лента подписка автор сообщество текст комментарий новость '
+    'фото день город работа книга музыка кино путешествие утро вечер '
+    'lorem ipsum dolor sit amet consectetur adipiscing elit sed do'
+).split()
+PASSWORD = 'benchmark'
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--users', type=int, default=100_000)
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--comments', type=int, default=5_000_000)
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument(
+        '--follows', type=int, default=10,
+        help='Среднее число подписок у пользователя.'
+    )
+    parser.add_argument(
+        '--alpha', type=float, default=1.1,
+        help='Показатель степенного закона популярности.'
+    )
+    parser.add_argument(
+        '--scale', type=float, default=1.0,
+        help='Множитель для --users, --posts, --comments и --groups.'
+    )
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--prefix', default='bench')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+    for name in ('users', 'posts', 'comments', 'groups'):
+        setattr(args, name, max(int(getattr(args, name) * args.scale), 1))
+    return args
+
+
+class PowerLaw:
+    """Случайный выбор из values с весом 1 / rank ** alpha."""
+
+    def __init__(self, values, alpha, rnd):
+        self.values = values
+        self.rnd = rnd
+        ranks = list(range(len(values)))
+        rnd.shuffle(ranks)
+        total = 0.0
+        self.cum_weights = array('d')
+        for rank in ranks:
+            total += 1 / (rank + 1) ** alpha
+            self.cum_weights.append(total)
+        self.total = total
+
+    def index(self):
+        point = self.rnd.random() * self.total
+        index = bisect.bisect_right(self.cum_weights, point)
+        return min(index, len(self.cum_weights) - 1)
+
+    def choice(self):
+        return self.values[self.index()]
+
+
+def insert(model, objects, batch_size, label):
+    from django.db import transaction
+
+    from posts.bulk import batches, keep_dates
+
+    start = time.perf_counter()
+    total = 0
+    with keep_dates(model):
+        for batch in batches(objects, batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+            total += len(batch)
+            print(f'\r{label}: {total}', end='', flush=True)
+    elapsed = time.perf_counter() - start
+    print(f'\r{label}: {total} за {elapsed:.1f} с '
+          f'({total / max(elapsed, 1e-9):.0f} строк/с)')
+
+
+def random_text(rnd, low, high):
+    return ' '.join(rnd.choices(WORDS, k=rnd.randint(low, high))).capitalize()
+
+
+def create_users(args, rnd, now):
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+
+    User = get_user_model()
+    # Хеш пароля считается один раз: иначе PBKDF2 займёт часы.
+    password = make_password(PASSWORD)
+    joined = now - timedelta(days=args.days)
+    insert(User, (
+        User(
+            username=f'{args.prefix}{number}',
+            email=f'{args.prefix}{number}@example.com',
+            password=password,
+            date_joined=joined,
+        )
+        for number in range(args.users)
+    ), args.batch_size, 'Пользователи')
+    return array('q', User.objects.filter(
+        username__startswith=args.prefix
+    ).order_by('pk').values_list('pk', flat=True))
+
+
+def create_groups(args):
+    from posts.models import Group
+
+    insert(Group, (
+        Group(
+            title=f'Сообщество {number}',
+            slug=f'{args.prefix}-{number}',
+            description=f'Описание сообщества {number}',
+        )
+        for number in range(args.groups)
+    ), args.batch_size, 'Сообщества')
+    return list(Group.objects.filter(
+        slug__startswith=f'{args.prefix}-'
+    ).values_list('pk', flat=True))
+
+
+def create_posts(args, rnd, now, users, groups):
+    from posts.models import Post
+    from posts.text import render_post
+
+    authors = PowerLaw(users, args.alpha, rnd)
+    seconds = args.days * 24 * 3600
+
+    def posts():
+        for _ in range(args.posts):
+            pub_date = now - timedelta(seconds=rnd.uniform(0, seconds))
+            post = Post(
+                text=random_text(rnd, 5, 80),
+                author_id=authors.choice(),
+                group_id=rnd.choice(groups) if rnd.random() < 0.7 else None,
+                pub_date=pub_date,
+                modified=pub_date,
+            )
+            # Готовый HTML и начало текста: сигнал pre_save не сработает.
+            render_post(post)
+            yield post
+
+    insert(Post, posts(), args.batch_size, 'Посты')
+    ids = array('q')
+    dates = array('d')
+    rows = Post.objects.filter(
+        author__username__startswith=args.prefix
+    ).order_by().values_list('pk', 'pub_date')
+    for pk, pub_date in rows.iterator(chunk_size=args.batch_size):
+        ids.append(pk)
+        dates.append(pub_date.timestamp())
+    return ids, dates
+
+
+def create_comments(args, rnd, now, users, posts):
+    from django.utils import timezone
+
+    from posts.models import Comment
+
+    ids, dates = posts
+    popular = PowerLaw(range(len(ids)), args.alpha, rnd)
+    current = now.timestamp()
+
+    def comments():
+        for _ in range(args.comments):
+            index = popular.index()
+            created = datetime.fromtimestamp(
+                rnd.uniform(dates[index], current), timezone.utc
+            )
+            yield Comment(
+                post_id=ids[index],
+                author_id=rnd.choice(users),
+                text=random_text(rnd, 3, 30),
+                created=created,
+                modified=created,
+            )
+
+    insert(Comment, comments(), args.batch_size, 'Комментарии')
+
+
+def create_follows(args, rnd, users):
+    from posts.models import Follow
+
+    authors = PowerLaw(users, args.alpha, rnd)
+    limit = min(len(users) - 1, 5000)
+
+    def follows():
+        for user_id in users:
+            # Число подписок тоже с тяжёлым хвостом, в среднем args.follows.
+            count = int(rnd.paretovariate(2) * args.follows / 2)
+            targets = {authors.choice() for _ in range(min(count, limit))}
+            targets.discard(user_id)
+            for author_id in targets:
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    insert(Follow, follows(), args.batch_size, 'Подписки')
+
+
+def fill_timelines():
+    """Ленты подписок одним INSERT ... SELECT вместо fan_out на каждый пост."""
+    from django.db import transaction
+
+    from posts.timeline import fill_all
+
+    start = time.perf_counter()
+    with transaction.atomic():
+        total = fill_all()
+    print(f'Ленты подписок: {total} за {time.perf_counter() - start:.1f} с')
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup()
+
+    from django.utils import timezone
+
+    from posts.cache import bump_all_feeds
+    from posts.counters import recount_all
+
+    rnd = random.Random(args.seed)
+    now = timezone.now()
+    start = time.perf_counter()
+    users = create_users(args, rnd, now)
+    groups = create_groups(args)
+    posts = create_posts(args, rnd, now, users, groups)
+    create_comments(args, rnd, now, users, posts)
+    create_follows(args, rnd, users)
+    recount_all()
+    fill_timelines()
+    # Сигналы при bulk_create не срабатывали: версии лент в FeedVersion
+    # прежние, и закешированные страницы и ETag надо сбросить.
+    bump_all_feeds()
+    print(f'Готово за {time.perf_counter() - start:.1f} с, '
+          f'пароль пользователей: {PASSWORD}')
+
+
+if __name__ == '__main__':
+    main()
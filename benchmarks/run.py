@@ -0,0 +1,315 @@
+"""
+Нагрузочный прогон всех URL из posts.urls и users.urls.
+
+Каждый URL запрашивается --requests раз параллельно из --clients потоков,
+анонимно и от имени автора самого большого профиля. Для каждого URL
+считаются p50/p95/p99 времени ответа, пропускная способность и число
+SQL-запросов на ответ (по данным posts.metrics). Результат сохраняется
+в JSON, который можно сравнить с прошлым прогоном через benchmarks.compare.
+
+По умолчанию запросы идут через тестовый клиент Django в этом же
+процессе; с --base-url — по HTTP к запущенному серверу, тогда число
+SQL-запросов берётся из его /metrics/.
+"""
+import argparse
+import json
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+
+from . import RESULTS_DIR, setup
+
+MODES = ('anonymous', 'authenticated')
+METRIC_RE = re.compile(r'^(\w+)\{view="([^"]*)"\} (\S+)$')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument(
+        '--requests', type=int, default=200,
+        help='Число запросов к каждому URL в каждом режиме.'
+    )
+    parser.add_argument(
+        '--warmup', type=int, default=1,
+        help='Неучитываемые запросы от каждого клиента перед замером.'
+    )
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--only', nargs='+', metavar='NAME')
+    parser.add_argument('--exclude', nargs='+', metavar='NAME', default=())
+    parser.add_argument('--base-url', help='Например http://127.0.0.1:8000')
+    parser.add_argument('--output', help='Файл для результатов в JSON.')
+    return parser.parse_args(argv)
+
+
+def percentile(values, percent):
+    """Перцентиль методом ближайшего ранга по отсортированному списку."""
+    if not values:
+        return None
+    rank = math.ceil(percent / 100 * len(values))
+    return values[min(max(rank, 1), len(values)) - 1]
+
+
+class InProcessTransport:
+    name = 'in-process'
+
+    def client(self, user):
+        from django.test import Client
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+        return client
+
+    def get(self, client, path):
+        return client.get(path).status_code
+
+    def post(self, client, path, data):
+        return client.post(path, data).status_code
+
+    def finish_thread(self):
+        from django.db import connections
+        connections.close_all()
+
+    def metrics(self):
+        from posts.metrics import registry
+        return registry.snapshot()
+
+
+class HttpTransport:
+    def __init__(self, base_url):
+        import requests
+        self.requests = requests
+        self.base_url = base_url.rstrip('/')
+        self.name = self.base_url
+
+    def client(self, user):
+        from django.urls import reverse
+
+        from .generate import PASSWORD
+
+        session = self.requests.Session()
+        if user is None:
+            return session
+        url = self.base_url + reverse('login')
+        session.get(url)
+        session.post(url, data={
+            'username': user.username,
+            'password': PASSWORD,
+            'csrfmiddlewaretoken': session.cookies.get('csrftoken', ''),
+        }, headers={'Referer': url}, allow_redirects=False)
+        if 'sessionid' not in session.cookies:
+            raise SystemExit(
+                f'Не удалось войти как {user.username}: пароль '
+                f'сгенерированных пользователей — {PASSWORD}'
+            )
+        return session
+
+    def get(self, client, path):
+        response = client.get(self.base_url + path, allow_redirects=False)
+        return response.status_code
+
+    def post(self, client, path, data):
+        data = dict(
+            data, csrfmiddlewaretoken=client.cookies.get('csrftoken', '')
+        )
+        response = client.post(
+            self.base_url + path, data=data, allow_redirects=False
+        )
+        return response.status_code
+
+    def finish_thread(self):
+        pass
+
+    def metrics(self):
+        from posts.metrics import METRICS
+        names = {name: field for field, (name, _) in METRICS.items()}
+        response = self.requests.get(self.base_url + '/metrics/')
+        if response.status_code != 200:
+            return {}
+        snapshot = {}
+        for line in response.text.splitlines():
+            match = METRIC_RE.match(line)
+            if match and match.group(1) in names:
+                name, view, value = match.groups()
+                snapshot.setdefault(view, {})[names[name]] = float(value)
+        return snapshot
+
+
+def sample_objects():
+    """Автор с наибольшим числом постов, его последний пост и группа."""
+    from posts.models import Group, Post, UserStats
+
+    stats = UserStats.objects.select_related('user').order_by(
+        '-post_count'
+    ).first()
+    if stats is None or not stats.post_count:
+        raise SystemExit(
+            'В базе нет постов: сначала запустите benchmarks.generate'
+        )
+    author = stats.user
+    post = Post.objects.filter(author=author).order_by('-pub_date').first()
+    group = post.group or Group.objects.order_by('pk').first()
+    kwargs = {
+        'username': author.username,
+        'post_id': post.pk,
+        'slug': group.slug if group else 'missing',
+    }
+    return author, kwargs
+
+
+def collect_urls(kwargs, only=None, exclude=()):
+    from django.urls import reverse
+
+    from posts import urls as posts_urls
+    from users import urls as users_urls
+
+    urls = []
+    for module in (posts_urls, users_urls):
+        for pattern in module.urlpatterns:
+            name = pattern.name
+            if name in exclude or (only and name not in only):
+                continue
+            params = {key: kwargs[key] for key in pattern.pattern.converters}
+            urls.append((name, reverse(name, kwargs=params)))
+    return urls
+
+
+def hammer(transport, clients, path, total, data=None):
+    """
+    Запросы к path из всех клиентов; возвращает задержки и статусы.
+    С data вместо GET отправляется POST с этими полями.
+    """
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    share, extra = divmod(total, len(clients))
+
+    def worker(client, count):
+        own_latencies = []
+        own_statuses = Counter()
+        try:
+            for _ in range(count):
+                start = time.perf_counter()
+                try:
+                    if data is None:
+                        status = transport.get(client, path)
+                    else:
+                        status = transport.post(client, path, data)
+                except Exception as error:
+                    status = type(error).__name__
+                own_latencies.append(time.perf_counter() - start)
+                own_statuses[str(status)] += 1
+        finally:
+            transport.finish_thread()
+        with lock:
+            latencies.extend(own_latencies)
+            statuses.update(own_statuses)
+
+    threads = [
+        threading.Thread(
+            target=worker, args=(client, share + (number < extra))
+        )
+        for number, client in enumerate(clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, statuses, time.perf_counter() - start
+
+
+def summarize(latencies, statuses, elapsed, before, after):
+    latencies = sorted(latencies)
+    requests = after.get('requests', 0) - before.get('requests', 0)
+    queries = after.get('queries', 0) - before.get('queries', 0)
+    result = {
+        'requests': len(latencies),
+        'errors': sum(
+            count for status, count in statuses.items()
+            if not status.isdigit() or int(status) >= 500
+        ),
+        'statuses': dict(statuses),
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'queries_per_request': (
+            round(queries / requests, 2) if requests else None
+        ),
+    }
+    for percent in (50, 95, 99):
+        value = percentile(latencies, percent)
+        result[f'p{percent}_ms'] = round(value * 1000, 2) if value else None
+    return result
+
+
+def data_counts():
+    from django.contrib.auth import get_user_model
+
+    from posts.models import Comment, Follow, Post
+
+    return {
+        'users': get_user_model().objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    setup()
+
+    from django.db import connection
+    from django.utils import timezone
+
+    transport = (
+        HttpTransport(args.base_url) if args.base_url
+        else InProcessTransport()
+    )
+    author, kwargs = sample_objects()
+    urls = collect_urls(kwargs, args.only, args.exclude)
+    report = {
+        'meta': {
+            'started': timezone.now().isoformat(),
+            'transport': transport.name,
+            'vendor': connection.vendor,
+            'clients': args.clients,
+            'requests': args.requests,
+            'data': data_counts(),
+        },
+        'results': {},
+    }
+    for mode in args.modes:
+        user = author if mode == 'authenticated' else None
+        clients = [transport.client(user) for _ in range(args.clients)]
+        for name, path in urls:
+            key = f'{mode}:{name}'
+            if args.warmup:
+                hammer(transport, clients, path, args.warmup * len(clients))
+            before = transport.metrics().get(name, {})
+            latencies, statuses, elapsed = hammer(
+                transport, clients, path, args.requests
+            )
+            after = transport.metrics().get(name, {})
+            result = summarize(latencies, statuses, elapsed, before, after)
+            report['results'][key] = dict(result, path=path)
+            print(
+                f'{key:<32} p50 {result["p50_ms"]:>8} ms  '
+                f'p95 {result["p95_ms"]:>8} ms  '
+                f'p99 {result["p99_ms"]:>8} ms  '
+                f'{result["throughput_rps"]:>8} rps  '
+                f'{result["queries_per_request"]} SQL'
+            )
+    output = args.output or os.path.join(
+        RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S.json')
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as file:
+        json.dump(report, file, ensure_ascii=False, indent=2)
+    print(f'Результаты: {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+WSGI-сервер Yatube с постоянным набором потоков (как gthread-воркер
+gunicorn) для бенчмарков, которым нужен отдельный процесс с другими
+настройками.
+
+    python -m benchmarks.server --port 8765 --threads 8
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer
+
+from . import ROOT_DIR, setup
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class ThreadPoolWSGIServer(WSGIServer):
+    def __init__(self, address, handler, threads):
+        super().__init__(address, handler)
+        self.executor = ThreadPoolExecutor(threads)
+
+    def process_request(self, request, client_address):
+        self.executor.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise SystemExit(f'Сервер на порту {port} не запустился')
+
+
+@contextmanager
+def running_server(port, threads, env):
+    """Запускает сервер в отдельном процессе с дополнительными env."""
+    command = [
+        sys.executable, '-m', 'benchmarks.server',
+        '--port', str(port), '--threads', str(threads),
+    ]
+    server = subprocess.Popen(
+        command, cwd=ROOT_DIR, env=dict(os.environ, **env)
+    )
+    try:
+        wait_for_port(port)
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args(argv)
+    setup()
+    from django.core.wsgi import get_wsgi_application
+
+    server = ThreadPoolWSGIServer(
+        ('127.0.0.1', args.port), QuietHandler, args.threads
+    )
+    server.set_app(get_wsgi_application())
+    server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
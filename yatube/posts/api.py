@@ -0,0 +1,178 @@
+"""
+JSON API только для чтения: ленты, профили, подписки и пост
+с комментариями.
+
+Строки выбираются через values() — объекты моделей не создаются.
+Страницы листаются курсором (?cursor=), как и в HTML-лентах. С
+?format=ndjson лента отдаётся целиком потоком по строке JSON на пост:
+она читается порциями по API_STREAM_CHUNK, так что память не растёт
+с длиной ленты.
+"""
+import json
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .models import Comment, Group, Post, TimelineEntry, User
+from .paginator import CommentPaginator, CursorPaginator, TimelinePaginator
+from .timeline import celebrity_posts_for
+
+NDJSON = 'application/x-ndjson'
+
+# Имя поля в ответе -> поле для values()
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comment_count': 'comment_count',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'created': 'created',
+    'author': 'author__username',
+}
+
+
+def post_values(queryset):
+    return queryset.values(*POST_FIELDS.values())
+
+
+def _post_json(row):
+    data = {name: row[field] for name, field in POST_FIELDS.items()}
+    image = data['image']
+    data['image'] = default_storage.url(image) if image else None
+    return data
+
+
+def _comment_json(row):
+    return {name: row[field] for name, field in COMMENT_FIELDS.items()}
+
+
+class TimelineValuesPaginator(TimelinePaginator):
+    """Лента подписок словарями: id постов из ленты, затем их values()."""
+
+    def _posts(self, entries):
+        ids = list(entries.values_list('post_id', flat=True))
+        rows = post_values(Post.objects.filter(pk__in=ids))
+        by_id = {row['id']: row for row in rows}
+        return [by_id[pk] for pk in ids if pk in by_id]
+
+
+def _pages(paginator, cursor=None):
+    page = paginator.get_page(cursor)
+    yield page
+    while page.next_cursor:
+        page = paginator.get_page(page.next_cursor)
+        yield page
+
+
+def _stream(paginator, serialize):
+    for page in _pages(paginator):
+        yield ''.join(
+            json.dumps(serialize(row), cls=DjangoJSONEncoder,
+                       ensure_ascii=False) + '\n'
+            for row in page
+        )
+
+
+def _page_json(page, serialize):
+    return {
+        'results': [serialize(row) for row in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }
+
+
+def _error(detail, status):
+    return JsonResponse({'detail': detail}, status=status)
+
+
+def _feed_response(request, queryset, paginator_class=CursorPaginator,
+                   serialize=_post_json, per_page=None, **kwargs):
+    if request.GET.get('format') == 'ndjson':
+        paginator = paginator_class(
+            queryset, settings.API_STREAM_CHUNK, **kwargs
+        )
+        return StreamingHttpResponse(
+            _stream(paginator, serialize), content_type=NDJSON
+        )
+    paginator = paginator_class(
+        queryset, per_page or settings.PAG_POSTS, **kwargs
+    )
+    page = paginator.get_page(request.GET.get('cursor'))
+    return JsonResponse(_page_json(page, serialize))
+
+
+def posts(request):
+    return _feed_response(request, post_values(Post.objects.all()))
+
+
+def group_posts(request, slug):
+    group_id = Group.objects.filter(
+        slug=slug
+    ).values_list('pk', flat=True).first()
+    if group_id is None:
+        return _error('Группа не найдена', 404)
+    return _feed_response(
+        request, post_values(Post.objects.filter(group_id=group_id))
+    )
+
+
+def profile_posts(request, username):
+    author_id = User.objects.filter(
+        username=username
+    ).values_list('pk', flat=True).first()
+    if author_id is None:
+        return _error('Пользователь не найден', 404)
+    return _feed_response(
+        request, post_values(Post.objects.filter(author_id=author_id))
+    )
+
+
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        return _error('Требуется авторизация', 401)
+    extra_posts = celebrity_posts_for(request.user)
+    if extra_posts is not None:
+        extra_posts = post_values(extra_posts)
+    return _feed_response(
+        request,
+        TimelineEntry.objects.filter(user=request.user),
+        TimelineValuesPaginator,
+        extra_posts=extra_posts,
+    )
+
+
+def _comments(post_id):
+    return Comment.objects.filter(post_id=post_id).values(
+        *COMMENT_FIELDS.values()
+    )
+
+
+def post_detail(request, post_id):
+    """Пост и первая страница комментариев к нему."""
+    post = post_values(Post.objects.filter(pk=post_id)).first()
+    if post is None:
+        return _error('Пост не найден', 404)
+    paginator = CommentPaginator(_comments(post_id), settings.PAG_COMMENTS)
+    data = _post_json(post)
+    data['comments'] = _page_json(paginator.get_page(), _comment_json)
+    return JsonResponse(data)
+
+
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return _error('Пост не найден', 404)
+    return _feed_response(
+        request,
+        _comments(post_id),
+        CommentPaginator,
+        _comment_json,
+        settings.PAG_COMMENTS,
+    )
@@ -0,0 +1,66 @@
+import csv
+import gzip
+import itertools
+import json
+import sys
+from contextlib import contextmanager, nullcontext
+
+
+@contextmanager
+def keep_dates(model):
+    """
+    Отключает auto_now/auto_now_add у полей модели на время bulk_create.
+
+    Иначе pre_save перезапишет pub_date/created текущим временем,
+    и перенесённые или сгенерированные записи потеряют свои даты.
+    """
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False)
+        or getattr(field, 'auto_now_add', False)
+    ]
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def dump_format(path, fmt=None):
+    """Формат выгрузки: явный или по расширению (*.csv, *.csv.gz)."""
+    if fmt:
+        return fmt
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'csv' if name.endswith('.csv') else 'ndjson'
+
+
+def open_dump(path, mode='r'):
+    """Файл выгрузки: '-' — stdin/stdout, *.gz сжимается на лету."""
+    if path == '-':
+        return nullcontext(sys.stdin if mode == 'r' else sys.stdout)
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def read_rows(file, fmt):
+    """Словари строк из NDJSON или CSV с заголовком, без чтения в память."""
+    if fmt == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
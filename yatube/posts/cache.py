@@ -0,0 +1,200 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.middleware.csrf import get_token
+
+from .models import Comment, FeedVersion, Post
+
+ALL_FEEDS = 'all'
+
+
+def _digest(value):
+    # Имена пользователей могут содержать пробелы и кириллицу.
+    return hashlib.md5(str(value).encode()).hexdigest()
+
+
+def _version_key(feed, value):
+    return f'{feed}:{_digest(value)}'
+
+
+def feed_version(feed, value=''):
+    """
+    Версия ленты: сумма её собственной версии и общей, которую
+    увеличивает bump_all_feeds(). Один запрос по первичному ключу.
+    """
+    versions = FeedVersion.objects.filter(
+        key__in=(_version_key(feed, value), ALL_FEEDS)
+    ).values_list('version', flat=True)
+    return sum(versions)
+
+
+def _bump(key):
+    updated = FeedVersion.objects.filter(key=key).update(
+        version=F('version') + 1
+    )
+    if not updated:
+        # Начинаем не с единицы, чтобы не попасть на страницы в кеше,
+        # сохранённые с теми же номерами до пересоздания базы.
+        _, created = FeedVersion.objects.get_or_create(
+            key=key, defaults={'version': time.time_ns()}
+        )
+        if not created:
+            _bump(key)
+
+
+def bump_feed(feed, value=''):
+    _bump(_version_key(feed, value))
+
+
+def bump_all_feeds():
+    """Сбрасывает кеш и ETag всех лент, например после импорта."""
+    _bump(ALL_FEEDS)
+
+
+def bump_post_feeds(author_username, *group_slugs):
+    """Сбрасывает кеш всех лент, в которых виден пост."""
+    bump_feed('index')
+    bump_feed('profile', author_username)
+    for slug in group_slugs:
+        if slug:
+            bump_feed('group', slug)
+
+
+def _request_version(request, feed, value):
+    """feed_version() один раз на запрос: её читают и ETag, и кеш страниц."""
+    versions = request.__dict__.setdefault('_feed_versions', {})
+    if (feed, value) not in versions:
+        versions[feed, value] = feed_version(feed, value)
+    return versions[feed, value]
+
+
+def _page_key(request, feed, value):
+    version = _request_version(request, feed, value)
+    path = _digest(request.get_full_path())
+    return f'page:{feed}:{_digest(value)}:{version}:{path}'
+
+
+def cache_anonymous_page(feed, kwarg=None):
+    """
+    Кеширует страницу ленты целиком для неавторизованных пользователей.
+
+    Ключ содержит версию ленты (feed, значение kwarg из URL),
+    которую сигналы увеличивают при изменении постов и комментариев.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (
+                request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated
+            ):
+                return view(request, *args, **kwargs)
+            key = _page_key(request, feed, kwargs.get(kwarg, ''))
+            response = cache.get(key)
+            if response is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code == 200 and not response.cookies:
+                    cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def _etag(request, *parts):
+    """
+    ETag страницы: состояние данных, пользователь и полный путь.
+
+    Секрет CSRF входит в ключ, чтобы после его смены браузер не показал
+    форму со старым токеном из своего кеша. get_token() заводит секрет
+    уже сейчас, если cookie ещё нет, — иначе ETag первого ответа
+    разошёлся бы со следующими.
+    """
+    user = request.user
+    if user.is_authenticated:
+        get_token(request)
+        parts += (user.pk, request.META['CSRF_COOKIE'])
+    parts += (request.get_full_path(),)
+    return _digest(':'.join(map(str, parts)))
+
+
+def _version_subquery(key):
+    return Coalesce(Subquery(
+        FeedVersion.objects.filter(key=key).values('version')[:1]
+    ), 0)
+
+
+def _versions_annotation(feed, value):
+    """Версия ленты, как в feed_version(), выражением для annotate()."""
+    return (
+        _version_subquery(_version_key(feed, value))
+        + _version_subquery(ALL_FEEDS)
+    )
+
+
+def feed_etag(feed, kwarg=None, lookup=None):
+    """
+    Функция ETag для condition(): дата последнего поста ленты и версия
+    ленты, которую сигналы увеличивают при правках, удалениях
+    и комментариях. Один запрос по индексу *_pub_date_idx.
+    """
+    def etag(request, *args, **kwargs):
+        value = kwargs.get(kwarg, '')
+        posts = Post.objects.all()
+        if lookup:
+            posts = posts.filter(**{lookup: value})
+        state = posts.order_by('-pub_date', '-id').annotate(
+            version=_versions_annotation(feed, value)
+        ).values_list('pub_date', 'version').first()
+        if state is None:
+            # Пустая или несуществующая лента: без валидатора.
+            return None
+        latest, version = state
+        request.__dict__.setdefault('_feed_versions', {})[
+            feed, value
+        ] = version
+        return _etag(request, version, latest)
+    return etag
+
+
+def _post_state(request, username, post_id):
+    """
+    (modified, comment_count, последняя правка комментариев, версия
+    страницы) поста одним запросом.
+    """
+    if not hasattr(request, '_post_state'):
+        last_comment = Comment.objects.filter(
+            post=OuterRef('pk')
+        ).order_by('-modified').values('modified')[:1]
+        request._post_state = Post.objects.filter(
+            pk=post_id,
+            author__username=username,
+        ).annotate(
+            last_comment=Subquery(last_comment),
+            version=_versions_annotation('post', post_id),
+        ).values_list(
+            'modified', 'comment_count', 'last_comment', 'version'
+        ).first()
+    return request._post_state
+
+
+def post_etag(request, username, post_id):
+    state = _post_state(request, username, post_id)
+    if state is None:
+        return None
+    return _etag(request, *state)
+
+
+def post_last_modified(request, username, post_id):
+    # Страница авторизованного пользователя зависит не только от поста.
+    if request.user.is_authenticated:
+        return None
+    state = _post_state(request, username, post_id)
+    if state is None:
+        return None
+    modified, _, last_comment, _ = state
+    return max(modified, last_comment or modified)
@@ -0,0 +1,66 @@
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def check_connections(**kwargs):
+    """
+    Проверка постоянных соединений перед запросом (CONN_HEALTH_CHECKS).
+
+    Соединение, которое СУБД уже закрыла, отбрасывается здесь, а не
+    падает с ошибкой посреди представления.
+    """
+    for conn in connections.all():
+        if (
+            conn.connection is not None
+            and conn.settings_dict.get('CONN_HEALTH_CHECKS')
+            and not conn.in_atomic_block
+            and not conn.is_usable()
+        ):
+            conn.close()
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """Обработчик connection_created: settings.SQLITE_PRAGMAS для SQLite."""
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def is_locked(error):
+    return 'locked' in str(error)
+
+
+def atomic_retry(func, *args, **kwargs):
+    """
+    Выполняет func в короткой транзакции, повторяя её при блокировке базы.
+
+    Повторяется только внешняя транзакция: внутри чужой откатывать
+    и начинать заново нечего. Между попытками — экспоненциальная пауза
+    со случайной добавкой, чтобы конкуренты не просыпались разом.
+    """
+    attempts = settings.DB_WRITE_ATTEMPTS
+    for attempt in range(1, attempts + 1):
+        try:
+            with transaction.atomic():
+                return func(*args, **kwargs)
+        except OperationalError as error:
+            if (
+                attempt == attempts
+                or not is_locked(error)
+                or connection.in_atomic_block
+            ):
+                raise
+            delay = settings.DB_WRITE_RETRY_DELAY * 2 ** (attempt - 1)
+            logger.warning(
+                'База заблокирована, попытка %s из %s', attempt, attempts
+            )
+            time.sleep(delay * (1 + random.random()))
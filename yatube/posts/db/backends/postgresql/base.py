@@ -0,0 +1,11 @@
+from django.db.backends.postgresql import base
+
+from ...pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        # Для соединения из пула родительский метод не вызывался.
+        self.isolation_level = connection.isolation_level
+        return connection
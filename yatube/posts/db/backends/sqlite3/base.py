@@ -0,0 +1,23 @@
+from django.db.backends.sqlite3 import base
+
+from ...pool import PooledDatabaseWrapperMixin
+
+
+class DatabaseWrapper(PooledDatabaseWrapperMixin, base.DatabaseWrapper):
+    """
+    SQLite с необязательным пулом и режимом начала транзакций.
+
+    OPTIONS['transaction_mode'] = 'IMMEDIATE' берёт блокировку на запись
+    сразу в BEGIN: транзакция не упадёт с «database is locked» посреди
+    работы, когда ей понадобится повысить блокировку, а подождёт
+    busy_timeout в самом начале.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('transaction_mode', None)
+        return params
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict['OPTIONS'].get('transaction_mode')
+        self.cursor().execute(f'BEGIN {mode}' if mode else 'BEGIN')
@@ -0,0 +1,139 @@
+import queue
+import threading
+
+from django.db import DatabaseError
+
+
+class PoolTimeout(DatabaseError):
+    pass
+
+
+def ping(raw_connection):
+    """True, если соединение DB-API ещё отвечает."""
+    try:
+        cursor = raw_connection.cursor()
+        try:
+            cursor.execute('SELECT 1')
+        finally:
+            cursor.close()
+    except Exception:
+        return False
+    return True
+
+
+class ConnectionPool:
+    """
+    Пул физических соединений, общий для всех потоков процесса.
+
+    Одновременно выдаётся не больше max_size соединений; остальные
+    потоки ждут освобождения до timeout секунд.
+    """
+
+    def __init__(self, max_size, timeout):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+
+    def acquire(self, create, validate=None):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolTimeout(
+                f'Нет свободного соединения в пуле из {self.max_size}'
+            )
+        try:
+            while True:
+                try:
+                    raw_connection = self._idle.get_nowait()
+                except queue.Empty:
+                    return create()
+                if validate is None or validate(raw_connection):
+                    return raw_connection
+                self._close(raw_connection)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, raw_connection):
+        self._idle.put(raw_connection)
+        self._slots.release()
+
+    def discard(self, raw_connection):
+        self._close(raw_connection)
+        self._slots.release()
+
+    def _close(self, raw_connection):
+        try:
+            raw_connection.close()
+        except Exception:
+            pass
+
+    def close_idle(self):
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+
+class PooledDatabaseWrapperMixin:
+    """
+    Примесь к DatabaseWrapper: close() возвращает соединение в пул.
+
+    Пул включается настройкой OPTIONS['pool'] = {'max_size': 10,
+    'timeout': 10}; CONN_MAX_AGE при этом ставится в 0, чтобы соединение
+    возвращалось в пул в конце каждого запроса. Без неё соединения
+    открываются и закрываются как обычно.
+    """
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pool', None)
+        return params
+
+    @property
+    def pooled(self):
+        return 'pool' in self.settings_dict['OPTIONS']
+
+    def get_pool(self):
+        key = (self.alias, self.settings_dict['NAME'])
+        with self._pools_lock:
+            pool = self._pools.get(key)
+            if pool is None:
+                options = self.settings_dict['OPTIONS']['pool']
+                pool = self._pools[key] = ConnectionPool(
+                    options.get('max_size', 10),
+                    options.get('timeout', 10),
+                )
+        return pool
+
+    def get_new_connection(self, conn_params):
+        if not self.pooled:
+            return super().get_new_connection(conn_params)
+        parent = super()
+
+        def create():
+            return parent.get_new_connection(conn_params)
+
+        validate = None
+        if self.settings_dict.get('CONN_HEALTH_CHECKS'):
+            validate = ping
+        return self.get_pool().acquire(create, validate)
+
+    def _close(self):
+        if not self.pooled:
+            return super()._close()
+        if self.connection is None:
+            return
+        pool = self.get_pool()
+        if self.errors_occurred:
+            pool.discard(self.connection)
+            return
+        try:
+            # Незавершённая транзакция не должна достаться другому потоку.
+            self.connection.rollback()
+        except Exception:
+            pool.discard(self.connection)
+        else:
+            pool.release(self.connection)
@@ -1,5 +1,7 @@
+from django.core.files.uploadedfile import UploadedFile
 from django.forms import ModelForm
 
+from . import uploads
 from .models import Post, Comment
 
 
@@ -9,6 +11,13 @@ class PostForm(ModelForm):
         model = Post
         fields = ('group', 'text', 'image')
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Без новой загрузки здесь прежний файл поста или False (очистить).
+        if isinstance(image, UploadedFile):
+            return uploads.prepare(image)
+        return image
+
 
 class CommentForm(ModelForm):
     class Meta:
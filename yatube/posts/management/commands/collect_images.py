@@ -0,0 +1,85 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts import thumbnails
+from posts.counters import change_image_refs
+from posts.models import ImageBlob, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые больше не ссылается ни один пост '
+        '(заменены при правке или пост удалён), вместе с их миниатюрами.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace',
+            type=float,
+            default=24,
+            help='Сколько часов файл должен пролежать без ссылок.',
+        )
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--dry-run', action='store_true', help='Только показать.'
+        )
+
+    def remove(self, storage, pk, name, cutoff):
+        """
+        Удаляет строку ImageBlob и файлы в одной транзакции.
+
+        Загрузка того же содержимого сначала обновляет ImageBlob
+        (storage.register) и ждёт снятия блокировки строки, а файл
+        проверяет уже после: удалённый здесь файл она запишет заново.
+        """
+        with transaction.atomic():
+            if not ImageBlob.objects.filter(
+                pk=pk, refs=0, modified__lt=cutoff
+            ).delete()[0]:
+                return False
+            thumbnails.delete(name)
+            storage.delete(name)
+        return True
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['grace'])
+        storage = Post._meta.get_field('image').storage
+        orphans = ImageBlob.objects.filter(
+            refs=0, modified__lt=cutoff
+        ).order_by('pk')
+        last = 0
+        removed = freed = 0
+        start = time.perf_counter()
+        while True:
+            batch = dict(orphans.filter(pk__gt=last).values_list(
+                'pk', 'name'
+            )[:options['batch_size']])
+            if not batch:
+                break
+            last = max(batch)
+            # Счётчик мог разойтись с постами после массовых операций.
+            used = set(Post.objects.filter(
+                image__in=batch.values()
+            ).values_list('image', flat=True))
+            for pk, name in batch.items():
+                if name in used:
+                    change_image_refs(name, Post.objects.filter(
+                        image=name
+                    ).count())
+                    continue
+                size = storage.size(name) if storage.exists(name) else 0
+                if options['dry_run']:
+                    self.stdout.write(name)
+                elif not self.remove(storage, pk, name, cutoff):
+                    continue
+                removed += 1
+                freed += size
+        self.stdout.write(self.style.SUCCESS(
+            f'{"Можно удалить" if options["dry_run"] else "Удалено"} '
+            f'картинок: {removed}, {freed / 2 ** 20:.1f} МиБ '
+            f'за {time.perf_counter() - start:.1f} с'
+        ))
@@ -0,0 +1,90 @@
+import re
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from posts.models import Comment, Group, Post, User
+from posts.paginator import (CommentPaginator, CursorPaginator,
+                             TimelinePaginator, keyset)
+from posts.timeline import entries_for
+
+# Признаки сортировки во временной структуре в плане запроса
+SORT_MARKERS = {
+    'sqlite': ('USE TEMP B-TREE',),
+    'postgresql': ('Sort Key', 'Sort Method'),
+}
+# Страница после курсора должна начинаться с поиска по диапазону даты
+# в индексе, а не читать его с начала ленты
+RANGE_PATTERNS = {
+    'sqlite': r'SEARCH .*\b{field}[<>]',
+    'postgresql': r'Index Cond: .*\b{field} [<>]',
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает планы запросов всех лент и проверяет, что ни одна '
+        'не сортирует строки во временной таблице, а страницы после '
+        'курсора ищут диапазон дат по индексу.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Завершиться с ошибкой, если какой-то план не такой.',
+        )
+
+    def feeds(self):
+        user = User.objects.order_by('pk').first() or User(pk=0)
+        group = Group.objects.order_by('pk').first() or Group(pk=0)
+        post = Post.objects.order_by('pk').first() or Post(pk=0)
+        posts = Post.objects.for_feed()
+        return {
+            'index': (posts, CursorPaginator),
+            'group': (posts.filter(group=group), CursorPaginator),
+            'profile': (posts.filter(author=user), CursorPaginator),
+            'follow_index': (entries_for(user), TimelinePaginator),
+            'comments': (
+                Comment.objects.filter(post=post).select_related('author'),
+                CommentPaginator,
+            ),
+        }
+
+    def handle(self, *args, **options):
+        if connection.vendor not in SORT_MARKERS:
+            raise CommandError(
+                f'План для {connection.vendor} не поддерживается'
+            )
+        markers = SORT_MARKERS[connection.vendor]
+        range_pattern = RANGE_PATTERNS[connection.vendor]
+        position = (timezone.now(), 2 ** 31)
+        problems = []
+        for name, (queryset, paginator_class) in self.feeds().items():
+            paginator = paginator_class(queryset, settings.PAG_POSTS)
+            for page, cursor in (('first', None), ('cursor', position)):
+                sliced = keyset(
+                    paginator.object_list,
+                    paginator.key,
+                    cursor,
+                    limit=settings.PAG_POSTS,
+                    descending=paginator.descending,
+                )
+                plan = sliced.explain()
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f'{name} ({page} page)'
+                ))
+                self.stdout.write(plan)
+                if any(marker in plan for marker in markers):
+                    problems.append(f'{name} ({page} page): сортировка')
+                    self.stdout.write(self.style.WARNING('  ^ sorts rows'))
+                pattern = range_pattern.format(field=paginator.key[0])
+                if cursor and not re.search(pattern, plan):
+                    problems.append(f'{name} ({page} page): нет диапазона')
+                    self.stdout.write(self.style.WARNING(
+                        '  ^ scans from the start of the index'
+                    ))
+        if problems and options['check']:
+            raise CommandError('Плохие планы: ' + ', '.join(problems))
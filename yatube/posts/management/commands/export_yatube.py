@@ -0,0 +1,59 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.bulk import open_dump
+from posts.export import FIELDS, archive, lines
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии и подписки всего сайта или одного '
+        'пользователя потоком, не загружая их в память. В каталог пишутся '
+        'файлы для import_yatube, в *.zip — они же вместе с картинками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Каталог или файл *.zip.')
+        parser.add_argument('--user', help='Только данные этого автора.')
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'), default='ndjson'
+        )
+        parser.add_argument(
+            '--gzip', action='store_true', help='Сжимать файлы в каталоге.'
+        )
+
+    def handle(self, *args, **options):
+        user = None
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f'Нет пользователя {options["user"]}')
+        fmt = options['format']
+        output = options['output']
+        start = time.perf_counter()
+        if output.endswith('.zip'):
+            with open(output, 'wb') as file:
+                for chunk in archive(user, fmt):
+                    file.write(chunk)
+            self.stdout.write(self.style.SUCCESS(
+                f'Архив {output} за {time.perf_counter() - start:.1f} с'
+            ))
+            return
+        os.makedirs(output, exist_ok=True)
+        suffix = '.gz' if options['gzip'] else ''
+        for kind in FIELDS:
+            path = os.path.join(output, f'{kind}.{fmt}{suffix}')
+            total = 0
+            with open_dump(path, 'w') as file:
+                for line in lines(kind, fmt, user):
+                    file.write(line)
+                    total += 1
+            if fmt == 'csv':
+                total -= 1
+            self.stdout.write(f'{kind}: {total} строк -> {path}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.perf_counter() - start:.1f} с'
+        ))
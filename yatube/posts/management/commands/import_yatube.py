@@ -0,0 +1,259 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts.bulk import batches, dump_format, keep_dates, open_dump, read_rows
+from posts.cache import bump_all_feeds
+from posts.counters import recount_all, recount_images
+from posts.models import Comment, Follow, Group, Post, User
+from posts.text import render_post
+from posts.timeline import fill_all
+
+# Ограничение на число параметров в одном запросе SQLite
+LOOKUP_CHUNK = 900
+
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        yield values[start:start + LOOKUP_CHUNK]
+
+
+def _date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise ValueError(f'Неверная дата: {value}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+def _id(row):
+    # Без id повторная загрузка того же файла создала бы копии строк.
+    if row.get('id') in (None, ''):
+        raise ValueError(f'Нет id: {row}')
+    return int(row['id'])
+
+
+class Resolver:
+    """
+    Кеш имя пользователя -> id и slug группы -> id на всё время импорта.
+
+    Недостающих пользователей и группы создаёт одним bulk_create на пачку:
+    пользователи получают непригодный пароль, группы — slug вместо
+    названия.
+    """
+
+    def __init__(self):
+        self.users = {}
+        self.groups = {}
+        self.created = {'users': 0, 'groups': 0}
+
+    def _load(self, known, model, field, values):
+        for chunk in _chunks(values):
+            known.update(model.objects.filter(
+                **{f'{field}__in': chunk}
+            ).values_list(field, 'pk'))
+
+    def _resolve(self, known, model, field, values, build, counter):
+        missing = {value for value in values if value} - known.keys()
+        self._load(known, model, field, missing)
+        missing -= known.keys()
+        if not missing:
+            return
+        model.objects.bulk_create(
+            [build(value) for value in missing], ignore_conflicts=True
+        )
+        self.created[counter] += len(missing)
+        self._load(known, model, field, missing)
+
+    def user_ids(self, names):
+        self._resolve(
+            self.users, User, 'username', names,
+            lambda name: User(username=name, password=make_password(None)),
+            'users',
+        )
+        return self.users
+
+    def group_ids(self, slugs):
+        self._resolve(
+            self.groups, Group, 'slug', slugs,
+            lambda slug: Group(title=slug, slug=slug, description=''),
+            'groups',
+        )
+        return self.groups
+
+
+def _image(value):
+    # Выгрузка и API отдают адрес картинки, в базе хранится имя файла.
+    if value and value.startswith(settings.MEDIA_URL):
+        return value[len(settings.MEDIA_URL):]
+    return value or None
+
+
+def build_posts(rows, resolver):
+    users = resolver.user_ids(row['author'] for row in rows)
+    groups = resolver.group_ids(row.get('group') for row in rows)
+    posts = []
+    for row in rows:
+        pub_date = _date(row.get('pub_date'))
+        posts.append(Post(
+            id=_id(row),
+            text=row['text'],
+            author_id=users[row['author']],
+            group_id=groups.get(row.get('group')),
+            image=_image(row.get('image')),
+            pub_date=pub_date,
+            modified=_date(row.get('modified') or row.get('pub_date')),
+        ))
+        # bulk_create обходит сигналы: HTML готовим здесь.
+        render_post(posts[-1])
+    return posts
+
+
+def build_comments(rows, resolver):
+    users = resolver.user_ids(row['author'] for row in rows)
+    post_ids = set()
+    for chunk in _chunks({int(row['post']) for row in rows}):
+        post_ids.update(Post.objects.filter(
+            pk__in=chunk
+        ).values_list('pk', flat=True))
+    comments = []
+    for row in rows:
+        if int(row['post']) not in post_ids:
+            continue
+        created = _date(row.get('created'))
+        comments.append(Comment(
+            id=_id(row),
+            post_id=int(row['post']),
+            author_id=users[row['author']],
+            text=row['text'],
+            created=created,
+            modified=_date(row.get('modified') or row.get('created')),
+        ))
+    return comments
+
+
+def build_follows(rows, resolver):
+    users = resolver.user_ids(
+        name for row in rows for name in (row['user'], row['author'])
+    )
+    return [
+        Follow(user_id=users[row['user']], author_id=users[row['author']])
+        for row in rows if row['user'] != row['author']
+    ]
+
+
+KINDS = {
+    'posts': (Post, build_posts),
+    'comments': (Comment, build_comments),
+    'follows': (Follow, build_follows),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты, комментарии или подписки из NDJSON или CSV '
+        'пачками через bulk_create. Даты и id из файла сохраняются, '
+        'поэтому повторная загрузка не создаёт дублей; посты и комментарии '
+        'без id не принимаются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=KINDS)
+        parser.add_argument('path', help="Файл, *.gz или '-' для stdin.")
+        parser.add_argument('--format', choices=('ndjson', 'csv'))
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--state',
+            help='Файл с числом загруженных строк для продолжения после '
+                 'прерывания; по умолчанию PATH.progress.',
+        )
+
+    def handle(self, *args, **options):
+        model, build = KINDS[options['kind']]
+        path = options['path']
+        state = options['state'] or (
+            None if path == '-' else f'{path}.progress'
+        )
+        done = self.read_state(state)
+        if done:
+            self.stdout.write(f'Продолжаем после строки {done}')
+        resolver = Resolver()
+        total = 0
+        # bulk_create(ignore_conflicts=True) не сообщает, сколько строк
+        # пропущено, поэтому загруженные считаются по таблице.
+        before = model.objects.count()
+        start = time.perf_counter()
+        with open_dump(path) as file, keep_dates(model):
+            rows = read_rows(file, dump_format(path, options['format']))
+            for batch in batches(rows, options['batch_size']):
+                total += len(batch)
+                if total <= done:
+                    continue
+                batch = batch[max(done - total + len(batch), 0):]
+                with transaction.atomic():
+                    try:
+                        objects = build(batch, resolver)
+                    except (KeyError, TypeError, ValueError) as error:
+                        raise CommandError(
+                            f'Ошибка в строках до {total}: {error!r}'
+                        )
+                    model.objects.bulk_create(objects, ignore_conflicts=True)
+                self.write_state(state, total)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f'\r{total} строк, {(total - done) / elapsed:.0f} '
+                    f'строк/с', ending=''
+                )
+        inserted = model.objects.count() - before
+        elapsed = time.perf_counter() - start
+        self.stdout.write('')
+        self.finish(model)
+        if state and os.path.exists(state):
+            os.remove(state)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено {inserted} из {total - done} строк за {elapsed:.1f} с '
+            f'({(total - done) / max(elapsed, 1e-9):.0f} строк/с); '
+            f'новых пользователей: {resolver.created["users"]}, '
+            f'групп: {resolver.created["groups"]}'
+        ))
+
+    def read_state(self, state):
+        if not state or not os.path.exists(state):
+            return 0
+        with open(state) as file:
+            return json.load(file)['rows']
+
+    def write_state(self, state, rows):
+        if not state:
+            return
+        # Замена файла целиком: после сбоя останется старое или новое число.
+        temporary = f'{state}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'rows': rows}, file)
+        os.replace(temporary, state)
+
+    def finish(self, model):
+        """Счётчики, ленты подписок и кеш страниц: сигналы не срабатывали."""
+        with transaction.atomic():
+            bump_all_feeds()
+            recount_all()
+            recount_images()
+            fill_all()
+            # id из файла не сдвигают последовательность в PostgreSQL.
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [model]
+                ):
+                    cursor.execute(sql)
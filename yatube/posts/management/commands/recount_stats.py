@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.counters import recount_all, recount_images
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики комментариев, постов, подписок '
+        'и ссылок на картинки.'
+    )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            posts, users = recount_all()
+            images = recount_images()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано постов: {posts}, пользователей: {users}, '
+            f'картинок: {images}'
+        ))
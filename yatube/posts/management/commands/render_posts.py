@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.text import render_all
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново строит готовый HTML и начало текста постов для ленты '
+        'пачками через bulk_update. Нужна после изменения правил '
+        'отображения или POST_EXCERPT_*.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--stale',
+            action='store_true',
+            help='Только посты без готового HTML.',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        total = render_all(
+            batch_size=options['batch_size'],
+            stale_only=options['stale'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обновлено постов: {total} '
+            f'за {time.perf_counter() - start:.1f} с'
+        ))
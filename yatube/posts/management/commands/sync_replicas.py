@@ -0,0 +1,58 @@
+import os
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+def copy_sqlite(connection, path):
+    """
+    Согласованная копия открытой базы SQLite в файл path.
+
+    Копия пишется во временный файл и подменяет реплику целиком, так что
+    читатели видят либо старую, либо новую версию базы.
+    """
+    connection.ensure_connection()
+    temporary = f'{path}.tmp'
+    target = sqlite3.connect(temporary)
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
+    os.replace(temporary, path)
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в файлы реплик для чтения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=0,
+            help='Повторять копирование каждые N секунд (0 — один раз).',
+        )
+
+    def handle(self, *args, **options):
+        replicas = settings.DATABASE_REPLICAS
+        if not replicas:
+            raise CommandError('Реплики не настроены: задайте YATUBE_REPLICAS')
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError(
+                f'Для {primary.vendor} используйте репликацию самой СУБД'
+            )
+        while True:
+            start = time.perf_counter()
+            for alias in replicas:
+                connections[alias].close()
+                copy_sqlite(primary, connections[alias].settings_dict['NAME'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Реплики {", ".join(replicas)} обновлены '
+                f'за {time.perf_counter() - start:.2f} с'
+            ))
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,62 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def init_worker():
+    # Нужно при запуске процессов через spawn (macOS, Windows).
+    django.setup()
+
+
+def warm(name):
+    try:
+        return 'created' if thumbnails.generate(name) else 'cached'
+    except Exception:
+        return 'failed'
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт недостающие миниатюры постов и их варианты для srcset '
+        'на всех ядрах.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Число процессов; 0 — в текущем процессе.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=64)
+
+    def handle(self, *args, **options):
+        names = list(Post.objects.exclude(image='').exclude(
+            image__isnull=True
+        ).values_list('image', flat=True))
+        totals = {'created': 0, 'cached': 0, 'failed': 0}
+        if options['workers']:
+            # Дочерние процессы не должны делить соединение родителя.
+            connections.close_all()
+            with ProcessPoolExecutor(
+                options['workers'],
+                initializer=init_worker,
+            ) as executor:
+                results = executor.map(
+                    warm, names, chunksize=options['chunk_size']
+                )
+                for result in results:
+                    totals[result] += 1
+        else:
+            for name in names:
+                totals[warm(name)] += 1
+        self.stdout.write(self.style.SUCCESS(
+            'Создано: {created}, уже были: {cached}, '
+            'ошибок: {failed}'.format(**totals)
+        ))
@@ -0,0 +1,146 @@
+"""
+Отдача загруженных файлов из MEDIA_ROOT.
+
+Без веб-сервера впереди файл уходит через FileResponse, который
+WSGI-сервер отправляет через sendfile; поддерживаются Range
+и If-Modified-Since. С MEDIA_SENDFILE = 'x-accel-redirect' (nginx) или
+'x-sendfile' (Apache, lighttpd) Django только проверяет запрос и отдаёт
+заголовок, а байты отправляет веб-сервер.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified)
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .thumbnails import CONTENT_PREFIX
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+
+class FileRange:
+    """Часть файла для FileResponse: read() не выходит за length байт."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """
+    (start, end) включительно из заголовка Range или None, если его нет
+    или он не поддерживается. Несколько диапазонов сразу не отдаются:
+    по RFC 7233 вместо них можно вернуть файл целиком. ValueError, если
+    диапазон лежит за концом файла.
+    """
+    match = RANGE_RE.match(header.replace(' ', ''))
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _content_type(path):
+    content_type, _ = mimetypes.guess_type(path)
+    return content_type or 'application/octet-stream'
+
+
+def _offload(name, path):
+    # Длину и Range обработает веб-сервер, тип задаём сами: иначе
+    # nginx оставит text/html от пустого ответа Django.
+    response = HttpResponse(content_type=_content_type(path))
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_PREFIX + quote(name)
+        )
+    else:
+        response['X-Sendfile'] = path
+    return response
+
+
+def _file_response(request, path, stat, last_modified):
+    content_type = _content_type(path)
+    size = stat.st_size
+    byte_range = None
+    header = request.META.get('HTTP_RANGE')
+    if_range = request.META.get('HTTP_IF_RANGE')
+    # If-Range с другой датой: у клиента устаревшая часть, нужен весь файл.
+    if header and if_range in (None, last_modified):
+        try:
+            byte_range = parse_range(header, size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            FileRange(open(path, 'rb'), start, end - start + 1),
+            content_type=content_type,
+            status=206,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve_media(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    stat = os.stat(full_path)
+    if not was_modified_since(
+        request.META.get('HTTP_IF_MODIFIED_SINCE'),
+        stat.st_mtime,
+        stat.st_size,
+    ):
+        return HttpResponseNotModified()
+    last_modified = http_date(stat.st_mtime)
+    if settings.MEDIA_SENDFILE:
+        response = _offload(path, full_path)
+    else:
+        response = _file_response(request, full_path, stat, last_modified)
+    response['Last-Modified'] = last_modified
+    if path.startswith(CONTENT_PREFIX):
+        response['Cache-Control'] = (
+            f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        )
+    else:
+        response['Cache-Control'] = (
+            f'public, max-age={settings.MEDIA_MAX_AGE}'
+        )
+    return response
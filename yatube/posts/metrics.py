@@ -0,0 +1,168 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import connections
+from django.http import HttpResponse
+from django.template.backends.django import DjangoTemplates, Template
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('requests', 'queries', 'sql_seconds', 'render_seconds', 'bytes')
+METRICS = {
+    'requests': ('yatube_requests_total', 'Обработанные запросы'),
+    'queries': ('yatube_db_queries_total', 'SQL-запросы'),
+    'sql_seconds': ('yatube_db_seconds_total', 'Время в SQL, с'),
+    'render_seconds': (
+        'yatube_template_render_seconds_total', 'Время рендеринга, с'
+    ),
+    'bytes': ('yatube_response_bytes_total', 'Размер ответов, байт'),
+}
+# Ключи бюджета в settings.VIEW_BUDGETS и соответствующие поля замера
+BUDGET_FIELDS = {
+    'queries': ('queries', 1),
+    'sql_ms': ('sql_seconds', 1000),
+    'render_ms': ('render_seconds', 1000),
+    'bytes': ('bytes', 1),
+}
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.render_seconds = 0.0
+        self.bytes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_seconds += time.perf_counter() - start
+
+
+class Registry:
+    """Накопленные метрики процесса по имени URL."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = defaultdict(lambda: dict.fromkeys(FIELDS, 0))
+
+    def add(self, view, metrics):
+        with self._lock:
+            totals = self._totals[view]
+            totals['requests'] += 1
+            for field in FIELDS[1:]:
+                totals[field] += getattr(metrics, field)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: dict(totals) for view, totals in self._totals.items()
+            }
+
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
+
+    def as_prometheus(self):
+        lines = []
+        snapshot = self.snapshot()
+        for field in FIELDS:
+            name, help_text = METRICS[field]
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} counter')
+            for view, totals in sorted(snapshot.items()):
+                lines.append(f'{name}{{view="{view}"}} {totals[field]}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def check_budget(view, metrics):
+    budget = getattr(settings, 'VIEW_BUDGETS', {}).get(view)
+    if not budget:
+        return
+    exceeded = []
+    for key, limit in budget.items():
+        field, scale = BUDGET_FIELDS[key]
+        value = getattr(metrics, field) * scale
+        if value > limit:
+            exceeded.append(f'{key}={value:g} > {limit}')
+    if not exceeded:
+        return
+    message = f'Превышен бюджет {view}: ' + ', '.join(exceeded)
+    if getattr(settings, 'VIEW_BUDGETS_STRICT', False):
+        raise BudgetExceeded(message)
+    logger.warning(message)
+
+
+class MetricsMiddleware:
+    """Считает запросы к БД, время SQL и рендеринга и размер ответа."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = RequestMetrics()
+        request.metrics = metrics
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(metrics))
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        if match is None or not match.view_name:
+            return response
+        if not response.streaming:
+            metrics.bytes = len(response.content)
+        registry.add(match.view_name, metrics)
+        check_budget(match.view_name, metrics)
+        return response
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics = getattr(request, 'metrics', None)
+            if metrics is not None:
+                metrics.render_seconds += time.perf_counter() - start
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """
+    Шаблонизатор Django, замеряющий время рендеринга для MetricsMiddleware.
+
+    Учитывается только шаблон верхнего уровня: include внутри него
+    рендерятся движком напрямую и в сумму дважды не попадают.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+def metrics_view(request):
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    if request.META.get('REMOTE_ADDR') not in allowed:
+        raise PermissionDenied
+    return HttpResponse(
+        registry.as_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
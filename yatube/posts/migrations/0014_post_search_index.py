@@ -0,0 +1,63 @@
+from django.db import migrations
+
+SQLITE_FORWARD = (
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_post_fts_insert AFTER INSERT ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); "
+    "END",
+    "CREATE TRIGGER posts_post_fts_delete AFTER DELETE ON posts_post BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "END",
+    "CREATE TRIGGER posts_post_fts_update AFTER UPDATE OF text ON posts_post "
+    "BEGIN "
+    "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); "
+    "END",
+    "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')",
+)
+SQLITE_BACKWARD = (
+    'DROP TRIGGER IF EXISTS posts_post_fts_insert',
+    'DROP TRIGGER IF EXISTS posts_post_fts_delete',
+    'DROP TRIGGER IF EXISTS posts_post_fts_update',
+    'DROP TABLE IF EXISTS posts_post_fts',
+)
+# Выражение совпадает с тем, что строит SearchVector('text', config=...),
+# иначе PostgreSQL не воспользуется индексом.
+POSTGRES_FORWARD = (
+    "CREATE INDEX posts_post_text_search ON posts_post USING GIN "
+    "(to_tsvector('russian'::regconfig, COALESCE(text, '')))",
+)
+POSTGRES_BACKWARD = (
+    'DROP INDEX IF EXISTS posts_post_text_search',
+)
+
+
+def run_for_vendor(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement, params=None)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_auto_20261018_1931'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_for_vendor({
+                'sqlite': SQLITE_FORWARD,
+                'postgresql': POSTGRES_FORWARD,
+            }),
+            run_for_vendor({
+                'sqlite': SQLITE_BACKWARD,
+                'postgresql': POSTGRES_BACKWARD,
+            }),
+        ),
+    ]
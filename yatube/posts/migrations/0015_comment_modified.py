@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 19:44
+
+from django.db import migrations, models
+
+
+def copy_created(apps, schema_editor):
+    Comment = apps.get_model('posts', 'Comment')
+    Comment.objects.update(modified=models.F('created'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='modified',
+            field=models.DateTimeField(auto_now=True, verbose_name='date modified'),
+        ),
+        migrations.RunPython(copy_created, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-modified'], name='comment_post_modified_idx'),
+        ),
+    ]
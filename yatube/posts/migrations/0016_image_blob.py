@@ -0,0 +1,42 @@
+# Generated by Django 2.2.28 on 2026-10-18 20:48
+
+from django.db import migrations, models
+import posts.storage
+
+
+def recount_images(apps, schema_editor):
+    from posts.counters import recount_images
+    recount_images(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_comment_modified'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageBlob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('refs', models.PositiveIntegerField(default=0)),
+                ('modified', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        # Хранилище на схему не влияет, а пересоздание таблицы в SQLite
+        # потеряло бы триггеры поискового индекса.
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='post',
+                name='image',
+                field=models.ImageField(blank=True, null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/'),
+            ),
+        ]),
+        migrations.AddIndex(
+            model_name='imageblob',
+            index=models.Index(fields=['refs', 'modified'], name='image_blob_orphan_idx'),
+        ),
+        migrations.RunPython(recount_images, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 2.2.28 on 2026-10-18 21:01
+
+from django.db import migrations, models
+
+
+def render_posts(apps, schema_editor):
+    from posts.text import render_all
+    render_all(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_image_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='excerpt',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='text_html',
+            field=models.TextField(default='', editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='truncated',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(render_posts, migrations.RunPython.noop),
+    ]
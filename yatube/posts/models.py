@@ -1,6 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.db import models
 
+from .storage import ContentAddressedStorage
+
 User = get_user_model()
 
 
@@ -13,6 +15,17 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """
+        Всё, что нужно карточке поста, одним запросом. Полный текст
+        карточке не нужен: она показывает excerpt.
+        """
+        return self.select_related('author', 'group').defer(
+            'text', 'text_html'
+        )
+
+
 class Post(models.Model):
     text = models.TextField(
         verbose_name='Текст',
@@ -22,6 +35,10 @@ class Post(models.Model):
         'date published',
         auto_now_add=True
     )
+    modified = models.DateTimeField(
+        'date modified',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -37,17 +54,69 @@ class Post(models.Model):
     )
     image = models.ImageField(
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True,
         null=True
     )
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    # Заполняются при сохранении из text, см. posts.text
+    text_html = models.TextField(default='', editable=False)
+    excerpt = models.TextField(default='', editable=False)
+    truncated = models.BooleanField(default=False, editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='post_pub_date_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_pub_date_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
+class ImageBlob(models.Model):
+    """Файл картинки в хранилище и число постов, которые на него ссылаются."""
+    name = models.CharField(max_length=100, unique=True)
+    refs = models.PositiveIntegerField(default=0)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(
+            fields=['refs', 'modified'],
+            name='image_blob_orphan_idx'
+        )]
+
+    def __str__(self):
+        return self.name
+
+
+class FeedVersion(models.Model):
+    """
+    Версия ленты для ключей кеша страниц и ETag.
+
+    Хранится в базе, а не в кеше: её увеличивают сигналы в той же
+    транзакции, что и запись, и все процессы сразу видят новое значение.
+    """
+    key = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f'{self.key}: {self.version}'
+
+
 class Comment(models.Model):
     post = models.ForeignKey(
         Post,
@@ -64,6 +133,19 @@ class Comment(models.Model):
         help_text='Введите содержание Вашей публикации',
     )
     created = models.DateTimeField(auto_now_add=True)
+    modified = models.DateTimeField('date modified', auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx'
+            ),
+            models.Index(
+                fields=['post', '-modified'],
+                name='comment_post_modified_idx'
+            ),
+        ]
 
 
 class Follow(models.Model):
@@ -82,3 +164,39 @@ class Follow(models.Model):
             fields=['user', 'author'],
             name='unique_follows'
         )]
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    post_count = models.PositiveIntegerField(default=0)
+    follower_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['user', 'post'],
+            name='unique_timeline_entry'
+        )]
+        indexes = [models.Index(
+            fields=['user', '-pub_date', '-post'],
+            name='timeline_user_pub_date_idx'
+        )]
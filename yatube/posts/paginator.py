@@ -0,0 +1,234 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+def encode_token(values):
+    payload = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Список значений из непрозрачного токена; ValueError, если он битый."""
+    padded = token + '=' * (-len(token) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (binascii.Error, UnicodeDecodeError) as error:
+        raise ValueError(token) from error
+    if not isinstance(values, list):
+        raise ValueError(token)
+    return values
+
+
+def row_position(row, date_field='pub_date'):
+    """(дата, id) строки: объекта модели или словаря из values()."""
+    if isinstance(row, dict):
+        return row[date_field], row['id']
+    return getattr(row, date_field), row.pk
+
+
+def encode_cursor(obj, direction, date_field='pub_date'):
+    date, pk = row_position(obj, date_field)
+    return encode_token([direction, date.isoformat(), pk])
+
+
+def decode_cursor(token):
+    """Возвращает (направление, pub_date, id) или None для битого курсора."""
+    try:
+        direction, pub_date, pk = decode_token(token)
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (TypeError, ValueError):
+        return None
+    if direction not in (FORWARD, BACKWARD) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+def keyset(queryset, key, position=None, backward=False, limit=None,
+           descending=True):
+    """
+    Срез queryset после (или до) позиции (pub_date, id) по полям key.
+
+    queryset уже отсортирован по key (по умолчанию по убыванию); при
+    backward=True строки возвращаются в обратном порядке. Результат — ещё
+    не выполненный queryset, его план можно посмотреть через explain().
+    """
+    date_field, id_field = key
+    lookup = 'lt' if descending != backward else 'gt'
+    if position is not None:
+        pub_date, pk = position
+        # (дата < X) OR (дата = X AND id < Y) SQLite не превращает
+        # в диапазон по индексу и читает его с начала ленты. Отдельное
+        # условие дата <= X даёт SEARCH по диапазону на любой глубине.
+        queryset = queryset.filter(
+            Q(**{f'{date_field}__{lookup}e': pub_date}),
+            Q(**{f'{date_field}__{lookup}': pub_date})
+            | Q(**{f'{id_field}__{lookup}': pk}),
+        )
+    if backward:
+        queryset = queryset.reverse()
+    return queryset[:limit]
+
+
+class CursorPaginator(Paginator):
+    """
+    Паджинатор по ключу (pub_date, id) без OFFSET и COUNT(*).
+
+    Страница — обычный Page, к которому добавлены next_cursor
+    и previous_cursor для ссылок в includes/paginator.html.
+    """
+    key = ('pub_date', 'id')
+    descending = True
+
+    def __init__(self, object_list, per_page):
+        prefix = '-' if self.descending else ''
+        super().__init__(
+            object_list.order_by(*(prefix + field for field in self.key)),
+            per_page
+        )
+
+    def get_page(self, cursor=None, page_number=None):
+        position = decode_cursor(cursor) if cursor else None
+        if position is not None:
+            direction, pub_date, pk = position
+            if direction == BACKWARD:
+                return self._page_before((pub_date, pk))
+            return self._page_after((pub_date, pk))
+        if page_number is not None:
+            return self._legacy_page(page_number)
+        return self._build_page(self._fetch(), False)
+
+    def _fetch(self, position=None, backward=False, limit=None):
+        return list(keyset(
+            self.object_list,
+            self.key,
+            position,
+            backward,
+            limit or self.per_page + 1,
+            self.descending,
+        ))
+
+    def _page_after(self, position):
+        return self._build_page(self._fetch(position), True)
+
+    def _page_before(self, position):
+        rows = self._fetch(position, backward=True)
+        if len(rows) <= self.per_page:
+            # Дошли до начала ленты: отдаём полноценную первую страницу.
+            return self._build_page(self._fetch(), False)
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return self._build_page(rows, True, has_next=True)
+
+    def _legacy_page(self, page_number):
+        """
+        Поддержка старых ссылок вида ?page=N одним запросом с OFFSET.
+
+        Страницы дальше PAG_MAX_LEGACY_PAGE не отдаются: OFFSET растёт
+        с номером, и глубокие ссылки стали бы дешёвым способом нагрузить
+        базу. Вместо них, как и вместо пустых, показывается первая.
+        """
+        try:
+            number = max(int(page_number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        if number > settings.PAG_MAX_LEGACY_PAGE:
+            return self._build_page(self._fetch(), False)
+        offset = (number - 1) * self.per_page
+        rows = self._slice(offset, self.per_page + 1)
+        if not rows and number > 1:
+            return self._build_page(self._fetch(), False)
+        return self._build_page(rows, number > 1, number=number)
+
+    def _slice(self, offset, limit):
+        return list(self.object_list[offset:offset + limit])
+
+    def _build_page(self, rows, has_previous, has_next=None, number=1):
+        if has_next is None:
+            has_next = len(rows) > self.per_page
+        object_list = rows[:self.per_page]
+        page = Page(object_list, number, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        date_field = self.key[0]
+        if object_list and has_next:
+            page.next_cursor = encode_cursor(
+                object_list[-1], FORWARD, date_field
+            )
+        if object_list and has_previous:
+            page.previous_cursor = encode_cursor(
+                object_list[0], BACKWARD, date_field
+            )
+        return page
+
+
+class TimelinePaginator(CursorPaginator):
+    """
+    Лента подписок по материализованным записям TimelineEntry.
+
+    Посты авторов, у которых слишком много подписчиков для рассылки
+    при записи (extra_posts), подмешиваются при чтении.
+    """
+    key = ('pub_date', 'post_id')
+
+    def __init__(self, object_list, per_page, extra_posts=None):
+        super().__init__(object_list, per_page)
+        self.extra_posts = extra_posts
+
+    def _fetch(self, position=None, backward=False, limit=None):
+        limit = limit or self.per_page + 1
+        posts = self._posts(
+            keyset(self.object_list, self.key, position, backward, limit)
+        )
+        if self.extra_posts is None:
+            return posts
+        posts += list(keyset(
+            self.extra_posts.order_by('-pub_date', '-id'),
+            CursorPaginator.key,
+            position,
+            backward,
+            limit,
+        ))
+        unique = {row_position(post)[1]: post for post in posts}
+        return sorted(
+            unique.values(),
+            key=row_position,
+            reverse=not backward,
+        )[:limit]
+
+    def _slice(self, offset, limit):
+        if self.extra_posts is None:
+            return self._posts(self.object_list[offset:offset + limit])
+        # Записи и подмешанные посты сливаются в Python, поэтому из каждого
+        # источника нужны все строки до offset; число страниц ограничено.
+        return self._fetch(limit=offset + limit)[offset:]
+
+    def _posts(self, entries):
+        """Посты по записям ленты в том же порядке."""
+        return [entry.post for entry in entries]
+
+
+class CommentPaginator(CursorPaginator):
+    """Комментарии поста от старых к новым по индексу (post, created, id)."""
+    key = ('created', 'id')
+    descending = False
+
+
+def get_page(request, queryset, paginator_class=CursorPaginator,
+             per_page=None, **kwargs):
+    paginator = paginator_class(
+        queryset, per_page or settings.PAG_POSTS, **kwargs
+    )
+    return paginator.get_page(
+        request.GET.get('cursor'),
+        request.GET.get('page'),
+    )
@@ -0,0 +1,90 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'use_primary'
+# Таблицы, которые читаются только с основной базы: сессия нужна сразу
+# после входа, когда реплика её ещё может не знать.
+PRIMARY_APPS = {'sessions'}
+
+_state = threading.local()
+
+
+def _replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+class PrimaryReplicaRouter:
+    """
+    Чтения внутри запроса — на реплику, запись — на основную базу.
+
+    Основная база используется и для чтения, если запрос уже что-то
+    записал, идёт транзакция или ReplicaPinMiddleware закрепил
+    пользователя за основной базой после недавней записи. Вне запросов
+    (команды, shell) всё читается с основной базы.
+    """
+
+    def db_for_read(self, model, **hints):
+        replica = getattr(_state, 'replica', None)
+        if (
+            replica is None
+            or _state.pinned
+            or model._meta.app_label in PRIMARY_APPS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        if getattr(_state, 'replica', None) is not None:
+            _state.pinned = _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему вместе с данными из основной базы.
+        return db not in _replicas()
+
+
+class ReplicaPinMiddleware:
+    """
+    Выбирает реплику на время запроса и закрепляет автора записи
+    за основной базой на REPLICA_PIN_SECONDS, чтобы он сразу видел
+    свои посты, комментарии и подписки.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        replicas = _replicas()
+        if not replicas:
+            return self.get_response(request)
+        pinned_until = request.COOKIES.get(PIN_COOKIE, '')
+        _state.replica = random.choice(replicas)
+        _state.pinned = (
+            pinned_until.isdigit() and int(pinned_until) > time.time()
+        )
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+            if _state.wrote:
+                seconds = settings.REPLICA_PIN_SECONDS
+                response.set_cookie(
+                    PIN_COOKIE,
+                    int(time.time() + seconds),
+                    max_age=seconds,
+                    httponly=True,
+                    samesite='Lax',
+                )
+        finally:
+            _state.replica = None
+        return response
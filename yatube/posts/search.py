@@ -0,0 +1,208 @@
+import re
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import F, FloatField, Func, TextField, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+from django.utils.safestring import mark_safe
+
+from .models import Post
+from .paginator import decode_token, encode_token
+
+# Служебные символы вместо <mark>: текст сниппета сначала экранируется,
+# и только потом они заменяются на теги подсветки.
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_WORDS = 24
+WORD_RE = re.compile(r'\w+')
+
+
+def highlight(snippet):
+    return mark_safe(
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def encode_search_cursor(post):
+    return encode_token([post.rank, post.pk])
+
+
+def decode_search_cursor(token):
+    try:
+        rank, pk = decode_token(token)
+        return float(rank), int(pk)
+    except (TypeError, ValueError):
+        return None
+
+
+# Триггеры, которыми SQLite ведёт индекс FTS5 (см. миграцию 0014).
+# Пересоздание posts_post (AddField, AlterField в миграциях) их удаляет.
+SQLITE_TRIGGERS = {
+    'posts_post_fts_insert': (
+        'AFTER INSERT ON posts_post BEGIN '
+        'INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); '
+        'END'
+    ),
+    'posts_post_fts_delete': (
+        'AFTER DELETE ON posts_post BEGIN '
+        "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+        "VALUES ('delete', old.id, old.text); "
+        'END'
+    ),
+    'posts_post_fts_update': (
+        'AFTER UPDATE OF text ON posts_post BEGIN '
+        "INSERT INTO posts_post_fts(posts_post_fts, rowid, text) "
+        "VALUES ('delete', old.id, old.text); "
+        'INSERT INTO posts_post_fts(rowid, text) VALUES (new.id, new.text); '
+        'END'
+    ),
+}
+
+
+def restore_sqlite_triggers(using=DEFAULT_DB_ALIAS):
+    """
+    Создаёт недостающие триггеры индекса и перестраивает его, если
+    какого-то не было: записи без триггера в индекс не попали.
+
+    Возвращает имена созданных триггеров.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name LIKE 'posts_post_fts%'"
+        )
+        existing = {name for name, in cursor.fetchall()}
+        if 'posts_post_fts' not in existing:
+            # Миграция с индексом ещё не применена.
+            return []
+        missing = [name for name in SQLITE_TRIGGERS if name not in existing]
+        for name in missing:
+            cursor.execute(f'CREATE TRIGGER {name} {SQLITE_TRIGGERS[name]}')
+        if missing:
+            cursor.execute(
+                "INSERT INTO posts_post_fts(posts_post_fts) VALUES ('rebuild')"
+            )
+    return missing
+
+
+class SQLiteSearchBackend:
+    """Поиск по виртуальной таблице FTS5, которую ведут триггеры."""
+    table = 'posts_post_fts'
+
+    def match_expression(self, query):
+        # Каждое слово — отдельная фраза с поиском по префиксу, поэтому
+        # кавычки и операторы FTS5 из запроса пользователя не мешают.
+        words = WORD_RE.findall(query)
+        return ' '.join(f'"{word}"*' for word in words)
+
+    def filter(self, queryset, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset.none()
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s',
+            [expression],
+        ))
+
+    def search(self, query, limit, after=None):
+        """Посты по убыванию релевантности: bm25 меньше — лучше."""
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        where = f'{self.table} MATCH %s'
+        params = [MARK_START, MARK_END, SNIPPET_WORDS, expression]
+        if after is not None:
+            rank, pk = after
+            where += (
+                f' AND (bm25({self.table}) > %s'
+                f' OR (bm25({self.table}) = %s AND rowid > %s))'
+            )
+            params += [rank, rank, pk]
+        sql = (
+            f"SELECT rowid, bm25({self.table}), "
+            f"snippet({self.table}, 0, %s, %s, '…', %s) "
+            f'FROM {self.table} WHERE {where} '
+            f'ORDER BY bm25({self.table}), rowid LIMIT %s'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            rows = cursor.fetchall()
+        posts = Post.objects.for_feed().in_bulk([row[0] for row in rows])
+        results = []
+        for pk, rank, snippet in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.rank = rank
+                post.snippet = highlight(snippet)
+                results.append(post)
+        return results
+
+
+class PostgresSearchBackend:
+    """Поиск по выражению to_tsvector с GIN-индексом."""
+    config = 'russian'
+
+    def vector(self):
+        from django.contrib.postgres.search import SearchVector
+        return SearchVector('text', config=self.config)
+
+    def query(self, query):
+        from django.contrib.postgres.search import SearchQuery
+        return SearchQuery(query, config=self.config)
+
+    def filter(self, queryset, query):
+        return queryset.annotate(
+            search_vector=self.vector()
+        ).filter(search_vector=self.query(query))
+
+    def search(self, query, limit, after=None):
+        from django.contrib.postgres.search import SearchRank
+        search_query = self.query(query)
+        headline = Func(
+            Value(self.config),
+            F('text'),
+            search_query,
+            Value(
+                f'StartSel={MARK_START}, StopSel={MARK_END}, '
+                f'MaxWords={SNIPPET_WORDS}, MinWords={SNIPPET_WORDS // 2}'
+            ),
+            function='ts_headline',
+            output_field=TextField(),
+        )
+        queryset = self.filter(Post.objects.for_feed(), query).annotate(
+            rank=Cast(
+                SearchRank(self.vector(), search_query),
+                FloatField()
+            ),
+            headline=headline,
+        )
+        if after is not None:
+            rank, pk = after
+            rank = -rank
+            queryset = queryset.filter(rank__lte=rank).exclude(
+                rank=rank, pk__lte=pk
+            )
+        results = list(queryset.order_by('-rank', 'pk')[:limit])
+        for post in results:
+            post.snippet = highlight(post.headline)
+            # Курсор общий с SQLite: меньше — лучше.
+            post.rank = -post.rank
+        return results
+
+
+BACKENDS = {
+    'sqlite': 'posts.search.SQLiteSearchBackend',
+    'postgresql': 'posts.search.PostgresSearchBackend',
+}
+
+
+def get_backend():
+    path = getattr(settings, 'POSTS_SEARCH_BACKEND', None)
+    return import_string(path or BACKENDS[connection.vendor])()
@@ -0,0 +1,171 @@
+import logging
+
+from django.core.signals import request_started
+from django.db.backends.signals import connection_created
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import timeline
+from .db import apply_sqlite_pragmas, check_connections
+from .cache import bump_all_feeds, bump_feed, bump_post_feeds
+from .counters import (change_comment_count, change_follow_counts,
+                       change_image_refs, change_post_count)
+from .models import Comment, Follow, Group, Post, User, UserStats
+from .search import restore_sqlite_triggers
+from .text import render_post
+
+logger = logging.getLogger(__name__)
+
+
+request_started.connect(check_connections)
+connection_created.connect(apply_sqlite_pragmas)
+
+
+@receiver(post_migrate)
+def restore_search_triggers(sender, using, **kwargs):
+    # Любая миграция, пересоздавшая posts_post в SQLite, теряет триггеры
+    # поиска: без них новые посты молча перестают попадать в индекс.
+    if sender.name != 'posts':
+        return
+    restored = restore_sqlite_triggers(using)
+    if restored:
+        logger.info(
+            'Восстановлены триггеры поиска: %s', ', '.join(restored)
+        )
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=User)
+def remember_old_username(sender, instance, raw=False, update_fields=None,
+                          **kwargs):
+    # Вход сохраняет только last_login: лишний запрос не нужен.
+    instance._old_username = None
+    if instance.pk and not raw and (
+        update_fields is None or 'username' in update_fields
+    ):
+        instance._old_username = User.objects.filter(
+            pk=instance.pk
+        ).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, created, raw=False, **kwargs):
+    # Имя автора есть в карточках всех лент, где видны его посты.
+    old = getattr(instance, '_old_username', None)
+    if not created and not raw and old and old != instance.username:
+        bump_all_feeds()
+
+
+@receiver(pre_save, sender=Group)
+def remember_old_group(sender, instance, raw=False, **kwargs):
+    instance._old_group = None
+    if instance.pk and not raw:
+        instance._old_group = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', 'title').first()
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    bump_feed('group', instance.slug)
+    old = getattr(instance, '_old_group', None)
+    if old and old != (instance.slug, instance.title):
+        # Название сообщества есть и в общей ленте, и в профилях.
+        bump_feed('group', old[0])
+        bump_all_feeds()
+
+
+def _group_slug(post):
+    return post.group.slug if post.group_id else None
+
+
+def _bump_feeds_of_post(post_id):
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if row is not None:
+        bump_post_feeds(*row)
+
+
+@receiver(pre_save, sender=Post)
+def remember_old_values(sender, instance, raw=False, **kwargs):
+    # При смене сообщества сбрасываем кеш и у прежней группы,
+    # при замене картинки освобождаем ссылку на прежний файл.
+    instance._old_group_slug = instance._old_image = None
+    if instance.pk and not raw:
+        old = Post.objects.filter(pk=instance.pk).values_list(
+            'group__slug', 'image'
+        ).first()
+        if old is not None:
+            instance._old_group_slug, instance._old_image = old
+
+
+@receiver(pre_save, sender=Post)
+def render_text(sender, instance, raw=False, **kwargs):
+    if not raw:
+        render_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        timeline.fan_out(instance)
+    image = instance.image.name or None
+    old_image = getattr(instance, '_old_image', None) or None
+    if image != old_image:
+        change_image_refs(image, 1)
+        change_image_refs(old_image, -1)
+    bump_post_feeds(
+        instance.author.username,
+        _group_slug(instance),
+        getattr(instance, '_old_group_slug', None),
+    )
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _bump_feeds_of_post(instance.post_id)
+
+
+def _bump_profiles(follow):
+    bump_feed('profile', follow.user.username)
+    bump_feed('profile', follow.author.username)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+        _bump_profiles(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    change_post_count(instance.author_id, -1)
+    change_image_refs(instance.image.name, -1)
+    bump_post_feeds(instance.author.username, _group_slug(instance))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    change_comment_count(instance.post_id, -1)
+    _bump_feeds_of_post(instance.post_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    change_follow_counts(instance.user_id, instance.author_id, -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.follower_left(instance.author_id)
+    _bump_profiles(instance)
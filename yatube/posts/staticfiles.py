@@ -0,0 +1,169 @@
+"""
+Статика с хешем содержимого в имени и заранее сжатыми копиями.
+
+collectstatic через CompressedManifestStaticFilesStorage кладёт рядом
+с каждым хешированным текстовым файлом .gz и, если установлен brotli,
+.br. StaticFilesMiddleware отдаёт их из STATIC_ROOT без Django-вьюх:
+выбирает сжатие по Accept-Encoding и передаёт файл через FileResponse,
+который WSGI-сервер может отправить через sendfile.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = {'.css', '.js', '.map', '.svg', '.txt', '.json', '.xml',
+                '.html', '.ico', '.eot', '.ttf', '.otf'}
+# Файлы меньше этого размера сжимать бессмысленно
+MIN_COMPRESS_SIZE = 256
+# ManifestStaticFilesStorage добавляет 12 символов md5 перед расширением
+HASHED_RE = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+MUTABLE_MAX_AGE = 60
+
+
+def _gzip(data):
+    buffer = BytesIO()
+    # mtime=0: одинаковый файл при каждой сборке.
+    with gzip.GzipFile(fileobj=buffer, mode='wb', compresslevel=9,
+                       mtime=0) as file:
+        file.write(data)
+    return buffer.getvalue()
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+# Суффикс файла -> (Content-Encoding, функция сжатия), по предпочтению
+ENCODINGS = {'.br': ('br', _brotli), '.gz': ('gzip', _gzip)}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # Статика ещё не собрана (тесты, свежий checkout): без хеша.
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        for name in set(self.hashed_files.values()):
+            self.compress(name)
+
+    def compress(self, name):
+        path = self.path(name)
+        if os.path.splitext(name)[1].lower() not in COMPRESSIBLE:
+            return
+        with open(path, 'rb') as file:
+            data = file.read()
+        if len(data) < MIN_COMPRESS_SIZE:
+            return
+        for suffix, (_, compress) in ENCODINGS.items():
+            if suffix == '.br' and brotli is None:
+                continue
+            compressed = compress(data)
+            # Копия, которая почти не меньше оригинала, не нужна.
+            if len(compressed) < len(data) * 0.95:
+                with open(path + suffix, 'wb') as file:
+                    file.write(compressed)
+
+
+def accepted_encodings(header):
+    """Кодировки из Accept-Encoding без явно запрещённых q=0."""
+    accepted = set()
+    for item in header.split(','):
+        coding, *params = item.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key.lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+class StaticFilesMiddleware:
+    """
+    Отдаёт собранную статику из STATIC_ROOT раньше остальных middleware.
+
+    Файлы с хешем в имени кешируются браузером на год как immutable,
+    остальные — на MUTABLE_MAX_AGE секунд. Если файла в STATIC_ROOT нет,
+    запрос идёт дальше (в DEBUG статику найдёт staticfiles).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if (
+            request.method in ('GET', 'HEAD')
+            and settings.STATIC_ROOT
+            and request.path_info.startswith(settings.STATIC_URL)
+        ):
+            response = self.serve(request)
+            if response is not None:
+                return response
+        return self.get_response(request)
+
+    def serve(self, request):
+        name = request.path_info[len(settings.STATIC_URL):]
+        try:
+            path = safe_join(settings.STATIC_ROOT, name)
+        except SuspiciousFileOperation:
+            return None
+        if not os.path.isfile(path):
+            return None
+        stat = os.stat(path)
+        if not was_modified_since(
+            request.META.get('HTTP_IF_MODIFIED_SINCE'),
+            stat.st_mtime,
+            stat.st_size,
+        ):
+            return HttpResponseNotModified()
+        content_type, _ = mimetypes.guess_type(path)
+        encoding = None
+        accepted = accepted_encodings(
+            request.META.get('HTTP_ACCEPT_ENCODING', '')
+        )
+        for suffix, (coding, _) in ENCODINGS.items():
+            if coding in accepted and os.path.isfile(path + suffix):
+                path += suffix
+                encoding = coding
+                break
+        response = FileResponse(
+            open(path, 'rb'),
+            content_type=content_type or 'application/octet-stream',
+        )
+        if encoding:
+            response['Content-Encoding'] = encoding
+        response['Vary'] = 'Accept-Encoding'
+        response['Last-Modified'] = http_date(stat.st_mtime)
+        if HASHED_RE.search(name):
+            response['Cache-Control'] = (
+                f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+            )
+        else:
+            response['Cache-Control'] = f'public, max-age={MUTABLE_MAX_AGE}'
+        return response
@@ -0,0 +1,103 @@
+"""
+Хранилище загруженных картинок с адресацией по содержимому.
+
+Файл лежит под именем из sha256 своего содержимого, поэтому одна и та же
+картинка, загруженная много раз, хранится один раз, а её миниатюры sorl
+(их ключ строится по имени исходника) создаются тоже один раз. Сколько
+постов ссылается на файл, считает ImageBlob; файлы без ссылок удаляет
+команда collect_images.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage
+from django.utils import timezone
+from django.utils.deconstruct import deconstructible
+
+# Права файла, если FILE_UPLOAD_PERMISSIONS не задан: mkstemp создаёт 0600,
+# и веб-сервер не смог бы отдать такой файл
+DEFAULT_PERMISSIONS = 0o644
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # Окончательное имя зависит от содержимого и выбирается в _save().
+        return name
+
+    def _save(self, name, content):
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        target_directory = self.path(directory)
+        os.makedirs(target_directory, exist_ok=True)
+        # Загрузка пишется во временный файл, а хеш считается по тем же
+        # частям: файл читается один раз и целиком в памяти не бывает.
+        digest = hashlib.sha256()
+        handle, temporary = tempfile.mkstemp(
+            dir=target_directory, suffix='.upload'
+        )
+        try:
+            with os.fdopen(handle, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            hexdigest = digest.hexdigest()
+            name = posixpath.join(
+                directory, hexdigest[:2], hexdigest + extension
+            )
+            register(name)
+            path = self.path(name)
+            if os.path.exists(path):
+                os.remove(temporary)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.chmod(temporary, (
+                    self.file_permissions_mode or DEFAULT_PERMISSIONS
+                ))
+                os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
+
+
+def write_addressed(storage, name, data):
+    """
+    Записывает data под именем name, которое уже выбрано по содержимому.
+
+    Два процесса с одинаковым содержимым получают одно имя: файл пишется
+    во временный и атомарно подменяется, поэтому читатели видят его
+    целиком, а суффикс от get_available_name не появляется.
+    """
+    path = storage.path(name)
+    if os.path.exists(path):
+        return name
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix='.upload')
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            file.write(data)
+        os.chmod(
+            temporary, storage.file_permissions_mode or DEFAULT_PERMISSIONS
+        )
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return name
+
+
+def register(name):
+    """
+    Заводит ImageBlob для файла или отодвигает его удаление: пока пост
+    с этой картинкой не сохранён, на файл ещё никто не ссылается.
+    """
+    blobs = apps.get_model('posts', 'ImageBlob').objects
+    if not blobs.filter(name=name).update(modified=timezone.now()):
+        blobs.get_or_create(name=name)
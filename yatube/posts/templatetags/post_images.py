@@ -0,0 +1,21 @@
+from django import template
+from django.conf import settings
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def cached_thumbnail(image):
+    return thumbnails.get_cached(image)
+
+
+@register.simple_tag
+def cached_sources(image):
+    return thumbnails.get_cached_sources(image) or []
+
+
+@register.simple_tag
+def post_card_timeout():
+    return settings.POST_CARD_CACHE_TIMEOUT
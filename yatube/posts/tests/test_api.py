@@ -0,0 +1,132 @@
+import json
+
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                text=f'Пост {number}',
+                group=cls.group if number % 2 else None,
+            )
+            for number in range(5)
+        ]
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def ids(self, data):
+        return [row['id'] for row in data['results']]
+
+    @override_settings(PAG_POSTS=2)
+    def test_feed_pages_follow_cursor(self):
+        url = reverse('api_posts')
+        data = self.guest_client.get(url).json()
+        self.assertEqual(self.ids(data), [self.posts[4].pk, self.posts[3].pk])
+        self.assertIsNone(data['previous'])
+        self.assertEqual(data['results'][0], {
+            'id': self.posts[4].pk,
+            'text': 'Пост 4',
+            'pub_date': data['results'][0]['pub_date'],
+            'author': 'writer',
+            'group': None,
+            'image': None,
+            'comment_count': 0,
+        })
+        data = self.guest_client.get(url, {'cursor': data['next']}).json()
+        self.assertEqual(self.ids(data), [self.posts[2].pk, self.posts[1].pk])
+        self.assertIsNotNone(data['previous'])
+
+    def test_group_and_profile_feeds(self):
+        data = self.guest_client.get(
+            reverse('api_group_posts', kwargs={'slug': 'group'})
+        ).json()
+        self.assertEqual(self.ids(data), [self.posts[3].pk, self.posts[1].pk])
+        data = self.guest_client.get(
+            reverse('api_profile_posts', kwargs={'username': 'reader'})
+        ).json()
+        self.assertEqual(data['results'], [])
+        response = self.guest_client.get(
+            reverse('api_group_posts', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        url = reverse('api_posts')
+        for per_page in (1, 5):
+            with self.subTest(per_page=per_page):
+                with override_settings(PAG_POSTS=per_page):
+                    with self.assertNumQueries(1):
+                        self.guest_client.get(url)
+
+    def test_follow_feed(self):
+        url = reverse('api_follow_posts')
+        self.assertEqual(self.guest_client.get(url).status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый')
+        data = self.reader_client.get(url).json()
+        self.assertEqual(self.ids(data)[:2], [post.pk, self.posts[4].pk])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_follow_feed_merges_celebrity_posts(self):
+        self.reader_client.get(
+            reverse('profile_follow', kwargs={'username': 'writer'})
+        )
+        post = Post.objects.create(author=self.author, text='Новый')
+        data = self.reader_client.get(reverse('api_follow_posts')).json()
+        self.assertEqual(
+            self.ids(data),
+            [post.pk] + [post.pk for post in reversed(self.posts)]
+        )
+
+    @override_settings(PAG_COMMENTS=2)
+    def test_post_with_comments(self):
+        post = self.posts[0]
+        comments = [
+            Comment.objects.create(
+                post=post, author=self.reader, text=f'Комментарий {number}'
+            )
+            for number in range(3)
+        ]
+        data = self.guest_client.get(
+            reverse('api_post', kwargs={'post_id': post.pk})
+        ).json()
+        self.assertEqual(data['text'], 'Пост 0')
+        self.assertEqual(
+            self.ids(data['comments']), [comments[0].pk, comments[1].pk]
+        )
+        self.assertEqual(data['comments']['results'][0]['author'], 'reader')
+        data = self.guest_client.get(
+            reverse('api_post_comments', kwargs={'post_id': post.pk}),
+            {'cursor': data['comments']['next']},
+        ).json()
+        self.assertEqual(self.ids(data), [comments[2].pk])
+        response = self.guest_client.get(
+            reverse('api_post', kwargs={'post_id': 0})
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(API_STREAM_CHUNK=2)
+    def test_ndjson_streams_whole_feed(self):
+        response = self.guest_client.get(
+            reverse('api_posts'), {'format': 'ndjson'}
+        )
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line)['id'] for line in lines],
+            [post.pk for post in reversed(self.posts)]
+        )
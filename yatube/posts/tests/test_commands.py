@@ -0,0 +1,369 @@
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import Q
+from django.test import TestCase, TransactionTestCase, override_settings
+
+from .. import thumbnails
+from ..counters import recount_images
+from ..management.commands.sync_replicas import copy_sqlite
+from ..models import (Comment, Follow, Group, ImageBlob, Post, TimelineEntry,
+                      User, UserStats)
+from .test_views import make_image
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class RecountStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        Comment.objects.create(post=cls.post, author=cls.user, text='1')
+        Comment.objects.create(post=cls.post, author=cls.user, text='2')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    def test_recount_stats_fixes_drift(self):
+        """recount_stats восстанавливает разошедшиеся счётчики."""
+        UserStats.objects.filter(user=self.user).delete()
+        UserStats.objects.update(post_count=42)
+        call_command('recount_stats', stdout=StringIO())
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+        author_stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(author_stats.post_count, 1)
+        self.assertEqual(author_stats.follower_count, 1)
+        self.assertEqual(author_stats.following_count, 0)
+        user_stats = UserStats.objects.get(user=self.user)
+        self.assertEqual(user_stats.post_count, 0)
+        self.assertEqual(user_stats.following_count, 1)
+
+    def test_recount_creates_many_missing_stats(self):
+        """Больше 500 пользователей без статистики — не одним INSERT."""
+        User.objects.bulk_create(
+            User(username=f'bulk{number}') for number in range(600)
+        )
+        call_command('recount_stats', stdout=StringIO())
+        self.assertEqual(UserStats.objects.count(), User.objects.count())
+
+
+class RenderPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='renderer')
+
+    def test_render_posts_backfills_html(self):
+        posts = [
+            Post.objects.create(author=self.user, text=f'Пост {number}\n<i>')
+            for number in range(3)
+        ]
+        Post.objects.update(text_html='', excerpt='')
+        Post.objects.filter(pk=posts[0].pk).update(text_html='старый')
+        out = StringIO()
+        call_command('render_posts', '--stale', '--batch-size=1', stdout=out)
+        self.assertIn('Обновлено постов: 2', out.getvalue())
+        self.assertEqual(
+            Post.objects.get(pk=posts[1].pk).excerpt, 'Пост 1<br>&lt;i&gt;'
+        )
+        call_command('render_posts', stdout=StringIO())
+        self.assertEqual(
+            Post.objects.get(pk=posts[0].pk).text_html, 'Пост 0<br>&lt;i&gt;'
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class CollectImagesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='collector')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.kept = Post.objects.create(
+            author=self.user, text='Остаётся', image=make_image('kept.png')
+        )
+        self.replaced = Post.objects.create(
+            author=self.user, text='Правка',
+            image=make_image('old.png', size=(20, 20)),
+        )
+        self.old_name = self.replaced.image.name
+        thumbnails.generate(self.old_name)
+        self.thumbnail = thumbnails.get_cached(self.old_name).name
+        self.replaced.image = make_image('new.png', size=(30, 30))
+        self.replaced.save()
+
+    def path(self, name):
+        return os.path.join(TEMP_MEDIA_ROOT, name)
+
+    def test_failed_file_removal_keeps_blob(self):
+        """Строка ImageBlob удаляется в одной транзакции с файлом."""
+        storage = Post._meta.get_field('image').storage
+        with mock.patch.object(
+            storage, 'delete', side_effect=OSError('busy')
+        ), self.assertRaises(OSError):
+            call_command('collect_images', '--grace', '0', stdout=StringIO())
+        self.assertTrue(ImageBlob.objects.filter(name=self.old_name).exists())
+        self.assertTrue(os.path.exists(self.path(self.old_name)))
+
+    def test_recount_creates_many_missing_blobs(self):
+        Post.objects.bulk_create(
+            Post(author=self.user, text='Импорт', image=f'posts/{number}.png')
+            for number in range(600)
+        )
+        recount_images()
+        self.assertEqual(
+            ImageBlob.objects.filter(name__regex=r'^posts/\d+\.png$').count(),
+            600,
+        )
+
+    def test_orphans_are_removed_after_grace_period(self):
+        call_command('collect_images', stdout=StringIO())
+        self.assertTrue(os.path.exists(self.path(self.old_name)))
+
+        call_command('collect_images', '--grace', '0', stdout=StringIO())
+        self.assertFalse(os.path.exists(self.path(self.old_name)))
+        self.assertFalse(os.path.exists(self.path(self.thumbnail)))
+        self.assertIsNone(thumbnails.get_cached(self.old_name))
+        self.assertFalse(ImageBlob.objects.filter(name=self.old_name).exists())
+        for post in (self.kept, self.replaced):
+            self.assertTrue(os.path.exists(post.image.path))
+            self.assertEqual(
+                ImageBlob.objects.get(name=post.image.name).refs, 1
+            )
+
+    def test_drifted_counter_is_fixed_instead_of_deleting(self):
+        ImageBlob.objects.filter(name=self.kept.image.name).update(refs=0)
+        out = StringIO()
+        call_command('collect_images', '--grace', '0', '--dry-run', stdout=out)
+        self.assertIn(self.old_name, out.getvalue())
+        self.assertNotIn(self.kept.image.name, out.getvalue())
+        self.assertTrue(os.path.exists(self.path(self.old_name)))
+        self.assertEqual(
+            ImageBlob.objects.get(name=self.kept.image.name).refs, 1
+        )
+
+
+class ExplainFeedsTest(TestCase):
+    def test_feeds_do_not_sort_in_temp_table(self):
+        """Все ленты читаются по индексу без временной сортировки."""
+        out = StringIO()
+        call_command('explain_feeds', '--check', stdout=out)
+        for feed in ('index', 'group', 'profile', 'follow_index'):
+            with self.subTest(feed=feed):
+                self.assertIn(f'{feed} (cursor page)', out.getvalue())
+
+    def test_cursor_page_without_index_range_fails(self):
+        """Фильтр курсора, который читает индекс с начала, не проходит."""
+        def full_scan(queryset, key, position=None, backward=False,
+                      limit=None, descending=True):
+            if position is not None:
+                date, pk = position
+                queryset = queryset.filter(
+                    Q(**{f'{key[0]}__lt': date})
+                    | Q(**{key[0]: date, f'{key[1]}__lt': pk})
+                )
+            return queryset[:limit]
+
+        with mock.patch(
+            'posts.management.commands.explain_feeds.keyset', full_scan
+        ), self.assertRaisesMessage(CommandError, 'нет диапазона'):
+            call_command('explain_feeds', '--check', stdout=StringIO())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class WarmThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='user')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Пост', image=make_image()
+        )
+        Post.objects.create(author=cls.user, text='Без картинки')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_warm_thumbnails_creates_missing(self):
+        out = StringIO()
+        call_command('warm_thumbnails', '--workers', '0', stdout=out)
+        self.assertIn('Создано: 1', out.getvalue())
+        self.assertIsNotNone(thumbnails.get_cached(self.post.image))
+
+        out = StringIO()
+        call_command('warm_thumbnails', '--workers', '0', stdout=out)
+        self.assertIn('уже были: 1', out.getvalue())
+
+
+class SyncReplicasTest(TransactionTestCase):
+    # Резервная копия SQLite ждёт конца открытой транзакции TestCase.
+    def test_copy_contains_primary_rows(self):
+        author = User.objects.create_user(username='primary_author')
+        Post.objects.create(author=author, text='С основной базы')
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, 'replica.sqlite3')
+        copy_sqlite(connection, path)
+        replica = sqlite3.connect(path)
+        try:
+            rows = replica.execute('SELECT text FROM posts_post').fetchall()
+        finally:
+            replica.close()
+        self.assertIn(('С основной базы',), rows)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_requires_replicas(self):
+        with self.assertRaises(CommandError):
+            call_command('sync_replicas', stdout=StringIO())
+
+
+class ImportYatubeTest(TestCase):
+    POSTS = [
+        {'id': 501, 'text': 'Первый', 'author': 'migrant',
+         'group': 'moved', 'pub_date': '2015-03-01T10:00:00+00:00'},
+        {'id': 502, 'text': 'Второй', 'author': 'migrant',
+         'group': None, 'pub_date': '2015-03-02T10:00:00+00:00'},
+    ]
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+        self.reader = User.objects.create_user(username='reader')
+
+    def write(self, name, rows):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            for row in rows:
+                file.write(json.dumps(row, ensure_ascii=False) + '\n')
+        return path
+
+    def load(self, *args):
+        out = StringIO()
+        call_command('import_yatube', *args, stdout=out)
+        return out.getvalue()
+
+    def test_import_keeps_dates_and_creates_references(self):
+        self.load('posts', self.write('posts.ndjson', self.POSTS))
+        self.load('follows', self.write('follows.ndjson', [
+            {'user': 'reader', 'author': 'migrant'},
+        ]))
+        out = self.load('comments', self.write('comments.ndjson', [
+            {'id': 601, 'post': 501, 'author': 'reader', 'text': 'Ответ',
+             'created': '2015-03-03T10:00:00+00:00'},
+            {'id': 602, 'post': 999, 'author': 'reader',
+             'text': 'Без поста'},
+        ]))
+        self.assertIn('Загружено 1 из 2 строк', out)
+
+        post = Post.objects.get(pk=501)
+        self.assertEqual(post.pub_date.year, 2015)
+        self.assertEqual(post.group, Group.objects.get(slug='moved'))
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(Comment.objects.get().created.day, 3)
+        author = User.objects.get(username='migrant')
+        self.assertFalse(author.has_usable_password())
+        self.assertEqual(author.stats.post_count, 2)
+        self.assertEqual(author.stats.follower_count, 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+        new_post = Post.objects.create(author=author, text='После импорта')
+        self.assertGreater(new_post.pk, 502)
+
+    def test_csv_import_can_be_repeated(self):
+        path = os.path.join(self.directory, 'posts.csv')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('id,text,author,group,pub_date\n')
+            file.write('7,"Текст, с запятой",migrant,,2016-01-01T00:00:00\n')
+        self.assertIn('Загружено 1 из 1 строк', self.load('posts', path))
+        self.assertIn('Загружено 0 из 1 строк', self.load('posts', path))
+        post = Post.objects.get()
+        self.assertEqual(post.text, 'Текст, с запятой')
+        self.assertIsNone(post.group)
+
+    def test_resume_skips_loaded_rows(self):
+        path = self.write('posts.ndjson', self.POSTS)
+        with open(f'{path}.progress', 'w') as file:
+            json.dump({'rows': 1}, file)
+        out = self.load('posts', path, '--batch-size', '1')
+        self.assertIn('Продолжаем после строки 1', out)
+        self.assertEqual(
+            list(Post.objects.values_list('pk', flat=True)), [502]
+        )
+        self.assertFalse(os.path.exists(f'{path}.progress'))
+
+    def test_broken_row(self):
+        rows = (
+            {'id': 1, 'text': 'Без автора'},
+            {'text': 'Без id', 'author': 'migrant'},
+        )
+        for row in rows:
+            with self.subTest(row=row):
+                path = self.write('posts.ndjson', [row])
+                with self.assertRaises(CommandError):
+                    self.load('posts', path)
+        self.assertFalse(Post.objects.exists())
+
+
+class ExportYatubeTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост, "с"')
+        cls.comment = Comment.objects.create(
+            post=cls.post, author=cls.author, text='Да'
+        )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, True)
+
+    def export(self, *args):
+        call_command('export_yatube', self.directory, *args, stdout=StringIO())
+
+    def test_export_can_be_imported_back(self):
+        self.export('--gzip')
+        path = os.path.join(self.directory, 'posts.ndjson.gz')
+        Post.objects.all().delete()
+        call_command('import_yatube', 'posts', path, stdout=StringIO())
+        post = Post.objects.get()
+        self.assertEqual(
+            (post.pk, post.text, post.pub_date),
+            (self.post.pk, self.post.text, self.post.pub_date),
+        )
+
+    def test_csv_export(self):
+        self.export('--format', 'csv', '--user', 'author')
+        with open(os.path.join(self.directory, 'comments.csv')) as file:
+            header, row = file.read().splitlines()
+        self.assertEqual(header, 'id,post,author,text,created,modified')
+        self.assertTrue(row.startswith(
+            f'{self.comment.pk},{self.post.pk},author,Да,'
+        ))
+
+    def test_unknown_user(self):
+        with self.assertRaises(CommandError):
+            self.export('--user', 'nobody')
@@ -0,0 +1,183 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+from unittest import mock
+
+from django.db import OperationalError, connection
+from django.urls import reverse
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+
+from ..db import apply_sqlite_pragmas, atomic_retry, check_connections
+from ..db.backends.sqlite3.base import DatabaseWrapper
+from ..db.pool import ConnectionPool, PoolTimeout, ping
+from ..models import Comment, Follow, Post, TimelineEntry, User
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(max_size=2, timeout=0.1)
+        self.created = []
+        self.addCleanup(self.pool.close_idle)
+
+    def create(self):
+        raw_connection = sqlite3.connect(':memory:', check_same_thread=False)
+        self.created.append(raw_connection)
+        return raw_connection
+
+    def test_released_connection_is_reused(self):
+        first = self.pool.acquire(self.create)
+        self.pool.release(first)
+        self.assertIs(self.pool.acquire(self.create), first)
+        self.assertEqual(len(self.created), 1)
+
+    def test_pool_is_bounded(self):
+        self.pool.acquire(self.create)
+        self.pool.acquire(self.create)
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire(self.create)
+
+    def test_waiting_thread_gets_released_connection(self):
+        pool = ConnectionPool(max_size=1, timeout=5)
+        first = pool.acquire(self.create)
+        timer = threading.Timer(0.05, pool.release, [first])
+        timer.start()
+        self.assertIs(pool.acquire(self.create), first)
+        timer.join()
+
+    def test_broken_connections_are_replaced(self):
+        first = self.pool.acquire(self.create)
+        self.pool.release(first)
+        first.close()
+        second = self.pool.acquire(self.create, ping)
+        self.assertIsNot(second, first)
+        self.assertTrue(ping(second))
+
+
+class HealthCheckTest(SimpleTestCase):
+    def make_connection(self, usable, health_checks=True):
+        return mock.Mock(
+            connection=object(),
+            settings_dict={'CONN_HEALTH_CHECKS': health_checks},
+            in_atomic_block=False,
+            **{'is_usable.return_value': usable},
+        )
+
+    def test_only_unusable_checked_connections_are_closed(self):
+        broken = self.make_connection(usable=False)
+        healthy = self.make_connection(usable=True)
+        unchecked = self.make_connection(usable=False, health_checks=False)
+        with mock.patch('posts.db.connections') as connections:
+            connections.all.return_value = [broken, healthy, unchecked]
+            check_connections()
+        broken.close.assert_called_once_with()
+        healthy.close.assert_not_called()
+        unchecked.close.assert_not_called()
+
+
+class SQLiteTuningTest(TestCase):
+    def cache_size(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_on_connect(self):
+        default = self.cache_size()
+        with override_settings(SQLITE_PRAGMAS={'cache_size': -4096}):
+            apply_sqlite_pragmas(sender=None, connection=connection)
+        self.assertEqual(self.cache_size(), -4096)
+        with override_settings(SQLITE_PRAGMAS={'cache_size': default}):
+            apply_sqlite_pragmas(sender=None, connection=connection)
+
+    def test_immediate_transaction_takes_write_lock(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, True)
+        path = os.path.join(directory, 'tuned.sqlite3')
+        wrapper = DatabaseWrapper(dict(
+            connection.settings_dict,
+            NAME=path,
+            OPTIONS={'transaction_mode': 'IMMEDIATE'},
+        ), alias='tuned')
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        wrapper._start_transaction_under_autocommit()
+        other = sqlite3.connect(path, timeout=0)
+        self.addCleanup(other.close)
+        with self.assertRaises(sqlite3.OperationalError):
+            other.execute('CREATE TABLE locked (id INTEGER)')
+        wrapper.connection.rollback()
+
+
+@override_settings(DB_WRITE_ATTEMPTS=3, DB_WRITE_RETRY_DELAY=0)
+class AtomicRetryTest(TransactionTestCase):
+    def flaky(self, failures, message='database is locked'):
+        calls = []
+
+        def func():
+            calls.append(1)
+            if len(calls) <= failures:
+                raise OperationalError(message)
+            return 'ok'
+        return func, calls
+
+    def test_locked_write_is_retried(self):
+        func, calls = self.flaky(2)
+        with self.assertLogs('posts.db', 'WARNING') as logs:
+            self.assertEqual(atomic_retry(func), 'ok')
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(len(logs.output), 2)
+
+    def test_gives_up_after_attempts(self):
+        func, calls = self.flaky(3)
+        with self.assertLogs('posts.db', 'WARNING'):
+            with self.assertRaises(OperationalError):
+                atomic_retry(func)
+        self.assertEqual(len(calls), 3)
+
+    def test_other_errors_are_not_retried(self):
+        func, calls = self.flaky(1, 'no such table')
+        with self.assertRaises(OperationalError):
+            atomic_retry(func)
+        self.assertEqual(len(calls), 1)
+
+    def test_retried_new_post_is_inserted_and_fanned_out(self):
+        """Повтор после отката создаёт пост заново, с рассылкой в ленты."""
+        author = User.objects.create_user(username='retry_author')
+        reader = User.objects.create_user(username='retry_reader')
+        Follow.objects.create(user=reader, author=author)
+        self.client.force_login(author)
+        with mock.patch(
+            'posts.views.change_post_count',
+            side_effect=[OperationalError('database is locked'), None],
+        ), self.assertLogs('posts.db', 'WARNING'), CaptureQueriesContext(
+            connection
+        ) as queries:
+            self.client.post(reverse('new_post'), {'text': 'Повтор'})
+        post = Post.objects.get()
+        # Повтор — снова INSERT, а не UPDATE строки, которой уже нет.
+        self.assertFalse(any(
+            query['sql'].startswith('UPDATE "posts_post" SET "text"')
+            for query in queries
+        ))
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=reader, post=post
+        ).exists())
+
+    def test_retried_comment_is_inserted(self):
+        author = User.objects.create_user(username='retry_commenter')
+        post = Post.objects.create(author=author, text='Пост')
+        self.client.force_login(author)
+        with mock.patch(
+            'posts.views.change_comment_count',
+            side_effect=[OperationalError('database is locked'), None],
+        ), self.assertLogs('posts.db', 'WARNING'):
+            self.client.post(
+                reverse('add_comment', kwargs={
+                    'username': author.username, 'post_id': post.pk,
+                }),
+                {'text': 'Комментарий'},
+            )
+        self.assertEqual(Comment.objects.filter(post=post).count(), 1)
@@ -1,10 +1,22 @@
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
+from .. import uploads
+from ..forms import PostForm
 from ..models import Group, Post, User
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
 
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostCreateFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -20,6 +32,11 @@ class PostCreateFormTests(TestCase):
             author=cls.user
         )
 
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
     def setUp(self):
         self.guest_client = Client()
         self.authorized_client = Client()
@@ -63,9 +80,11 @@ class PostCreateFormTests(TestCase):
             follow=True
         )
         self.assertEqual(Post.objects.count(), posts_count + 1)
+        digest = hashlib.sha256(small_gif).hexdigest()
         self.assertTrue(self.user.posts.filter(
             text=form_data['text'],
             group=form_data['group'],
+            image=f'posts/{digest[:2]}/{digest}.gif',
         ).exists())
 
     def test_edit_post(self):
@@ -83,3 +102,68 @@ class PostCreateFormTests(TestCase):
         self.assertTrue(self.user.posts.filter(
             text=form_data['text']
         ).exists())
+
+
+def upload(size, image_format='JPEG', name='photo.jpg', **options):
+    buffer = BytesIO()
+    Image.new('RGB', size, (0, 128, 255)).save(buffer, image_format, **options)
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadLimitsTest(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def clean(self, image):
+        form = PostForm({'text': 'Фото'}, {'image': image})
+        return form, form.is_valid()
+
+    def stored_size(self, image):
+        form, valid = self.clean(image)
+        self.assertTrue(valid, form.errors)
+        with Image.open(form.cleaned_data['image']) as stored:
+            return stored.format, stored.size
+
+    def test_large_images_are_downscaled_to_display_size(self):
+        cases = (
+            (upload((3000, 1500)), ('JPEG', (960, 480))),
+            (upload((1000, 4000), 'PNG', 'tall.png'), ('PNG', (960, 3840))),
+            (upload((4000, 1000), 'PNG', 'wide.png'), ('PNG', (1356, 339))),
+        )
+        for image, expected in cases:
+            with self.subTest(name=image.name):
+                self.assertEqual(self.stored_size(image), expected)
+
+    def test_exif_rotation_is_applied(self):
+        exif = Image.Exif()
+        exif[uploads.EXIF_ORIENTATION] = 6
+        self.assertEqual(
+            self.stored_size(upload((3000, 2000), exif=exif)),
+            ('JPEG', (960, 1440)),
+        )
+
+    def test_small_images_are_kept_as_is(self):
+        image = upload((400, 300))
+        content = image.read()
+        image.seek(0)
+        form, valid = self.clean(image)
+        self.assertTrue(valid)
+        self.assertEqual(form.cleaned_data['image'].read(), content)
+
+    def test_limits_are_checked_before_decoding(self):
+        with override_settings(IMAGE_MAX_BYTES=100):
+            form, valid = self.clean(upload((400, 300)))
+        self.assertFalse(valid)
+        self.assertEqual(form.errors.as_data()['image'][0].code,
+                         'file_too_big')
+        with override_settings(IMAGE_MAX_DECODE_PIXELS=10 ** 4):
+            form, valid = self.clean(upload((200, 200), 'PNG', 'big.png'))
+            self.assertFalse(valid)
+            self.assertEqual(form.errors.as_data()['image'][0].code,
+                             'too_many_pixels')
+            # JPEG декодируется с уменьшением, для него предел свой.
+            form, valid = self.clean(upload((200, 200)))
+            self.assertTrue(valid)
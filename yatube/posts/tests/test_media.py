@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.utils.http import http_date
+
+from .. import thumbnails
+from ..models import Post, User
+from .test_views import make_image
+
+DATA = bytes(range(256)) * 4
+
+
+class MediaViewTest(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+        media = override_settings(MEDIA_ROOT=self.root)
+        media.enable()
+        self.addCleanup(media.disable)
+        os.makedirs(os.path.join(self.root, 'posts'))
+        self.path = os.path.join(self.root, 'posts', 'file.jpg')
+        with open(self.path, 'wb') as file:
+            file.write(DATA)
+        self.url = '/media/posts/file.jpg'
+        self.client = Client()
+        cache.clear()
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_whole_file(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(int(response['Content-Length']), len(DATA))
+        self.assertEqual(self.body(response), DATA)
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_ranges(self):
+        cases = {
+            'bytes=10-19': (10, 19),
+            'bytes=1000-': (1000, 1023),
+            'bytes=-4': (1020, 1023),
+            'bytes=1020-5000': (1020, 1023),
+        }
+        for header, (start, end) in cases.items():
+            with self.subTest(header=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(
+                    response['Content-Range'], f'bytes {start}-{end}/1024'
+                )
+                self.assertEqual(
+                    int(response['Content-Length']), end - start + 1
+                )
+                self.assertEqual(self.body(response), DATA[start:end + 1])
+
+    def test_unsatisfiable_and_ignored_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2000-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+        response = self.client.get(self.url, HTTP_RANGE='bytes=0-1,5-6')
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='stale'
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_not_modified_and_missing(self):
+        modified = http_date(os.stat(self.path).st_mtime)
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=modified
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get('/media/posts/no.jpg').status_code,
+                         404)
+        self.assertEqual(
+            self.client.get('/media/../manage.py').status_code, 404
+        )
+
+    def test_offload_to_web_server(self):
+        with override_settings(MEDIA_SENDFILE='x-accel-redirect'):
+            response = self.client.get(self.url)
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/file.jpg'
+        )
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response.content, b'')
+        with override_settings(MEDIA_SENDFILE='x-sendfile'):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], self.path)
+
+    def test_thumbnail_has_content_addressed_immutable_url(self):
+        user = User.objects.create_user(username='media_author')
+        post = Post.objects.create(
+            author=user, text='Пост', image=make_image('media.png')
+        )
+        thumbnails.generate(post.image.name)
+        thumbnail = thumbnails.get_cached(post.image)
+        self.assertTrue(thumbnail.name.startswith(thumbnails.CONTENT_PREFIX))
+        response = self.client.get(thumbnail.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
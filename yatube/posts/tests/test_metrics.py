@@ -0,0 +1,78 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..metrics import BudgetExceeded, registry
+from ..models import Comment, Follow, Group, Post, User
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(title='Группа', slug='metrics')
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for number in range(15):
+            post = Post.objects.create(
+                author=cls.author,
+                group=cls.group,
+                text=f'Пост {number}',
+            )
+            Comment.objects.create(post=post, author=cls.user, text='Ок')
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    @override_settings(VIEW_BUDGETS_STRICT=True)
+    def test_views_fit_query_budgets(self):
+        """Страницы укладываются в бюджеты из settings.VIEW_BUDGETS."""
+        urls = (
+            reverse('index'),
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('post', kwargs={
+                'username': self.author.username,
+                'post_id': self.post.id,
+            }),
+            reverse('follow_index'),
+        )
+        for client in (self.guest_client, self.authorized_client):
+            for url in urls:
+                with self.subTest(url=url):
+                    client.get(url)
+
+    @override_settings(
+        VIEW_BUDGETS={'index': {'queries': 0}},
+        VIEW_BUDGETS_STRICT=True,
+    )
+    def test_exceeded_budget_fails_in_strict_mode(self):
+        with self.assertRaises(BudgetExceeded):
+            self.authorized_client.get(reverse('index'))
+
+    @override_settings(VIEW_BUDGETS={'index': {'queries': 0}})
+    def test_exceeded_budget_is_logged(self):
+        with self.assertLogs('posts.metrics', 'WARNING'):
+            self.authorized_client.get(reverse('index'))
+
+    def test_prometheus_endpoint(self):
+        self.authorized_client.get(reverse('index'))
+        response = self.guest_client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('yatube_requests_total{view="index"} 1', body)
+        self.assertIn('yatube_db_queries_total{view="index"}', body)
+        self.assertIn('yatube_template_render_seconds_total', body)
+        totals = registry.snapshot()['index']
+        self.assertGreater(totals['render_seconds'], 0)
+        self.assertGreater(totals['bytes'], 0)
+
+    def test_metrics_hidden_from_other_hosts(self):
+        response = self.guest_client.get('/metrics/', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 403)
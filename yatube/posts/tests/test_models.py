@@ -1,6 +1,7 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from ..models import User, Post, Group
+from ..text import head
 
 
 class PostModelTest(TestCase):
@@ -46,3 +47,35 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     post._meta.get_field(value).help_text, expected)
+
+
+@override_settings(POST_EXCERPT_CHARS=10, POST_EXCERPT_LINES=2)
+class PostTextTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create(username='writer')
+
+    def test_head_cuts_on_word_and_line(self):
+        cases = {
+            'коротко': 'коротко',
+            'одно два три четыре': 'одно два',
+            'раз\nдва\nтри': 'раз\nдва',
+            'оченьдлинноеслово': 'оченьдлинн',
+            'ровно два ': 'ровно два',
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(head(text), expected)
+
+    def test_save_renders_html_and_excerpt(self):
+        post = Post.objects.create(author=self.user, text='a<b\nодно два три')
+        self.assertEqual(post.text_html, 'a&lt;b<br>одно два три')
+        self.assertTrue(post.truncated)
+        self.assertEqual(post.excerpt, 'a&lt;b<br>одно…')
+        post.text = 'коротко'
+        post.save()
+        post.refresh_from_db()
+        self.assertFalse(post.truncated)
+        self.assertEqual(post.excerpt, 'коротко')
+        self.assertEqual(post.text_html, 'коротко')
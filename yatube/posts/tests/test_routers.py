@@ -0,0 +1,59 @@
+import time
+
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from ..models import Post
+from ..routers import PIN_COOKIE, PrimaryReplicaRouter, ReplicaPinMiddleware
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'], REPLICA_PIN_SECONDS=5)
+class RouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.factory = RequestFactory()
+
+    def run_request(self, actions, cookies=None):
+        """Выполняет actions внутри запроса и возвращает выбранные базы."""
+        seen = []
+
+        def view(request):
+            for action in actions:
+                seen.append(action(Post))
+            return HttpResponse()
+
+        request = self.factory.get('/')
+        request.COOKIES.update(cookies or {})
+        response = ReplicaPinMiddleware(view)(request)
+        return seen, response
+
+    def test_reads_go_to_replica_until_write(self):
+        read, write = self.router.db_for_read, self.router.db_for_write
+        seen, response = self.run_request([read, write, read])
+        self.assertEqual(
+            seen, ['replica1', DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS]
+        )
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+    def test_recent_writer_reads_from_primary(self):
+        pinned_until = str(int(time.time()) + 5)
+        seen, response = self.run_request(
+            [self.router.db_for_read], {PIN_COOKIE: pinned_until}
+        )
+        self.assertEqual(seen, [DEFAULT_DB_ALIAS])
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+    def test_expired_pin_reads_from_replica(self):
+        pinned_until = str(int(time.time()) - 1)
+        seen, _ = self.run_request(
+            [self.router.db_for_read], {PIN_COOKIE: pinned_until}
+        )
+        self.assertEqual(seen, ['replica1'])
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_migrations_skip_replicas(self):
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'posts'))
+        self.assertFalse(self.router.allow_migrate('replica1', 'posts'))
@@ -0,0 +1,104 @@
+from django.apps import apps
+from django.db import connection
+from django.db.models.signals import post_migrate
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post, User
+from ..search import SQLITE_TRIGGERS, get_backend
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='searcher')
+        cls.cat_post = Post.objects.create(
+            author=cls.user,
+            text='Кошка <b>спит</b> на диване',
+        )
+        cls.other_post = Post.objects.create(
+            author=cls.user,
+            text='Собака гуляет во дворе',
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        return self.guest_client.get(
+            reverse('search'), {'q': query, **params}
+        )
+
+    def test_search_finds_matching_posts(self):
+        response = self.search('кошка')
+        self.assertEqual(response.context['results'], [self.cat_post])
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        response = self.search('кошка')
+        snippet = response.context['results'][0].snippet
+        self.assertIn('<mark>Кошка</mark>', snippet)
+        self.assertIn('&lt;b&gt;', snippet)
+
+    def test_fts_syntax_in_query_is_ignored(self):
+        response = self.search('"кошка" (* -')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['results'], [self.cat_post])
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.get(pk=self.cat_post.pk)
+        post.text = 'Попугай'
+        post.save()
+        self.assertEqual(self.search('кошка').context['results'], [])
+        self.assertEqual(self.search('попугай').context['results'], [post])
+        post.delete()
+        self.assertEqual(self.search('попугай').context['results'], [])
+
+    @override_settings(PAG_POSTS=2)
+    def test_search_keyset_pagination(self):
+        posts = {
+            Post.objects.create(author=self.user, text=f'Кот номер {n}')
+            for n in range(3)
+        }
+        response = self.search('кот')
+        first = response.context['results']
+        cursor = response.context['next_cursor']
+        self.assertEqual(len(first), 2)
+        response = self.search('кот', cursor=cursor)
+        self.assertEqual(set(first + response.context['results']), posts)
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_backend_filter_for_admin(self):
+        queryset = get_backend().filter(Post.objects.all(), 'собака')
+        self.assertEqual(list(queryset), [self.other_post])
+
+
+class SearchTriggersTest(TestCase):
+    def triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'trigger'"
+            )
+            return {name for name, in cursor.fetchall()}
+
+    def test_post_migrate_restores_dropped_triggers(self):
+        """После пересоздания таблицы триггеры и индекс восстанавливаются."""
+        if connection.vendor != 'sqlite':
+            self.skipTest('Триггеры FTS5 есть только в SQLite')
+        with connection.cursor() as cursor:
+            for name in SQLITE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER {name}')
+        user = User.objects.create_user(username='lost')
+        post = Post.objects.create(author=user, text='Потерянный пост')
+        self.assertEqual(get_backend().search('потерянный', 10), [])
+
+        with self.assertLogs('posts.signals', 'INFO'):
+            post_migrate.send(
+                sender=apps.get_app_config('posts'),
+                app_config=apps.get_app_config('posts'),
+                verbosity=0,
+                interactive=False,
+                using=connection.alias,
+            )
+        self.assertLessEqual(set(SQLITE_TRIGGERS), self.triggers())
+        self.assertEqual(get_backend().search('потерянный', 10), [post])
@@ -0,0 +1,66 @@
+import gzip
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.templatetags.static import static
+from django.test import Client, TestCase, override_settings
+
+from ..staticfiles import accepted_encodings
+
+CSS = b'body { color: #333; }\n' * 100
+
+
+class StaticFilesTest(TestCase):
+    def setUp(self):
+        source = tempfile.mkdtemp()
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source, True)
+        self.addCleanup(shutil.rmtree, root, True)
+        os.makedirs(os.path.join(source, 'css'))
+        with open(os.path.join(source, 'css', 'site.css'), 'wb') as file:
+            file.write(CSS)
+        collected = override_settings(
+            STATICFILES_DIRS=[source], STATIC_ROOT=root
+        )
+        collected.enable()
+        self.addCleanup(collected.disable)
+        call_command('collectstatic', interactive=False, verbosity=0,
+                     stdout=StringIO())
+        self.root = root
+        self.url = static('css/site.css')
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        self.assertRegex(self.url, r'^/static/css/site\.[0-9a-f]{12}\.css$')
+        path = os.path.join(self.root, self.url[len('/static/'):])
+        with open(path + '.gz', 'rb') as file:
+            self.assertEqual(gzip.decompress(file.read()), CSS)
+
+    def test_middleware_serves_gzip_with_immutable_cache(self):
+        response = Client().get(self.url, HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', response['Cache-Control'])
+        body = b''.join(response.streaming_content)
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertEqual(gzip.decompress(body), CSS)
+
+    def test_middleware_serves_identity_and_unhashed_names(self):
+        response = Client().get(self.url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(b''.join(response.streaming_content), CSS)
+        response = Client().get('/static/css/site.css')
+        self.assertNotIn('immutable', response['Cache-Control'])
+        self.assertEqual(
+            Client().get('/static/css/missing.css').status_code, 404
+        )
+
+    def test_accepted_encodings(self):
+        self.assertEqual(
+            accepted_encodings('gzip, deflate;q=0.5, br;q=0'),
+            {'gzip', 'deflate'},
+        )
@@ -0,0 +1,81 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+
+from django.core.files.storage import FileSystemStorage
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from ..models import ImageBlob, Post, User
+from ..storage import write_addressed
+from .test_views import make_image
+
+
+class ContentAddressedStorageTest(TestCase):
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        media = override_settings(MEDIA_ROOT=root)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = User.objects.create_user(username='reposter')
+
+    def post(self, image):
+        return Post.objects.create(author=self.user, text='Пост', image=image)
+
+    def refs(self, name):
+        return ImageBlob.objects.get(name=name).refs
+
+    def test_same_content_is_stored_once(self):
+        first = self.post(make_image('cat.png'))
+        second = self.post(make_image('copy of cat.PNG'))
+        content = make_image().read()
+        digest = hashlib.sha256(content).hexdigest()
+        self.assertEqual(first.image.name, f'posts/{digest[:2]}/{digest}.png')
+        self.assertEqual(second.image.name, first.image.name)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(os.listdir(directory), [f'{digest}.png'])
+        self.assertEqual(self.refs(first.image.name), 2)
+        other = self.post(make_image('dog.png', size=(60, 40)))
+        self.assertNotEqual(other.image.name, first.image.name)
+
+    def test_refs_follow_edits_and_deletes(self):
+        post = self.post(make_image('old.png'))
+        old = post.image.name
+        post.image = make_image('new.png', size=(70, 30))
+        post.save()
+        self.assertEqual(self.refs(old), 0)
+        self.assertEqual(self.refs(post.image.name), 1)
+        post.text = 'Без смены картинки'
+        post.save()
+        self.assertEqual(self.refs(post.image.name), 1)
+        new = post.image.name
+        post.delete()
+        self.assertEqual(self.refs(new), 0)
+
+
+class WriteAddressedTest(SimpleTestCase):
+    def test_concurrent_writers_share_one_file(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, True)
+        storage = FileSystemStorage(location=root)
+        data = b'thumbnail' * 1000
+        names = []
+        barrier = threading.Barrier(4)
+
+        def write():
+            barrier.wait()
+            names.append(write_addressed(storage, 'thumbs/ab/ab.jpg', data))
+
+        threads = [threading.Thread(target=write) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(names, ['thumbs/ab/ab.jpg'] * 4)
+        self.assertEqual(
+            os.listdir(os.path.join(root, 'thumbs', 'ab')), ['ab.jpg']
+        )
+        with storage.open('thumbs/ab/ab.jpg') as file:
+            self.assertEqual(file.read(), data)
@@ -1,8 +1,27 @@
+import json
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO
+
 from django import forms
-from django.test import Client, TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.utils import make_template_fragment_key
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Group, Post, User, Follow
+from PIL import Image
+from sorl.thumbnail import default
+
+from .. import thumbnails
+from ..cache import bump_all_feeds
+from ..counters import recount_all
+from ..models import Comment, Group, Post, TimelineEntry, User, Follow
+from ..paginator import CursorPaginator
 
 
 class PostPagesTests(TestCase):
@@ -135,6 +154,9 @@ class PaginatorViewsTest(TestCase):
                 text='Тестовый текст' + str(number),
             )
 
+    def setUp(self):
+        cache.clear()
+
     def test_first_page_contains_ten_records(self):
         response = self.client.get(reverse('index'))
         self.assertEqual(len(response.context.get('page').object_list), 10)
@@ -142,3 +164,764 @@ class PaginatorViewsTest(TestCase):
     def test_second_page_contains_three_records(self):
         response = self.client.get(reverse('index') + '?page=2')
         self.assertEqual(len(response.context.get('page').object_list), 3)
+
+    def test_legacy_page_uses_single_sliced_query(self):
+        paginator = CursorPaginator(Post.objects.all(), 5)
+        with CaptureQueriesContext(connection) as queries:
+            page = paginator.get_page(page_number=3)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('LIMIT 6 OFFSET 10', queries[0]['sql'])
+        self.assertEqual(len(page.object_list), 3)
+        self.assertEqual(page.number, 3)
+
+    @override_settings(PAG_MAX_LEGACY_PAGE=1)
+    def test_legacy_page_past_limit_shows_first_page(self):
+        response = self.client.get(reverse('index') + '?page=2')
+        page = response.context['page']
+        self.assertEqual(page.number, 1)
+        self.assertEqual(len(page.object_list), 10)
+
+    def test_cursor_walks_posts_with_equal_dates(self):
+        """Посты с одной датой не теряются и не повторяются на границе."""
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+        paginator = CursorPaginator(Post.objects.all(), 4)
+        page = paginator.get_page()
+        seen = list(page.object_list)
+        while page.next_cursor:
+            page = paginator.get_page(page.next_cursor)
+            seen += page.object_list
+        self.assertEqual(
+            [post.pk for post in seen],
+            list(Post.objects.order_by('-id').values_list('pk', flat=True)),
+        )
+
+    def test_next_cursor_contains_three_records(self):
+        first_page = self.client.get(reverse('index')).context['page']
+        response = self.client.get(
+            reverse('index') + f'?cursor={first_page.next_cursor}'
+        )
+        page = response.context['page']
+        self.assertEqual(len(page.object_list), 3)
+        self.assertIsNone(page.next_cursor)
+
+    def test_previous_cursor_returns_first_page(self):
+        first_page = self.client.get(reverse('index')).context['page']
+        second_page = self.client.get(
+            reverse('index') + f'?cursor={first_page.next_cursor}'
+        ).context['page']
+        response = self.client.get(
+            reverse('index') + f'?cursor={second_page.previous_cursor}'
+        )
+        page = response.context['page']
+        self.assertEqual(list(page.object_list), list(first_page.object_list))
+        self.assertIsNone(page.previous_cursor)
+
+    def test_broken_cursor_shows_first_page(self):
+        response = self.client.get(reverse('index') + '?cursor=broken')
+        self.assertEqual(len(response.context['page'].object_list), 10)
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(title='Группа', slug='feed')
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for number in range(12):
+            post = Post.objects.create(
+                group=cls.group,
+                author=cls.author,
+                text=f'Пост {number}',
+            )
+            Comment.objects.create(post=post, author=cls.user, text='Ок')
+        recount_all()
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def count_queries(self, url, per_page):
+        with override_settings(PAG_POSTS=per_page):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.authorized_client.get(url)
+        self.assertEqual(len(response.context['page']), per_page)
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Число запросов ленты не растёт вместе с размером страницы."""
+        urls = (
+            reverse('index'),
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('follow_index'),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.count_queries(url, 2),
+                    self.count_queries(url, 10),
+                )
+
+    def test_feed_shows_comment_count(self):
+        response = self.authorized_client.get(reverse('index'))
+        self.assertEqual(response.context['page'][0].comment_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
+
+
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='talker')
+        cls.post = Post.objects.create(author=cls.author, text='Обсуждение')
+        for number in range(7):
+            user = User.objects.create_user(username=f'commenter{number}')
+            Comment.objects.create(
+                post=cls.post, author=user, text=f'Комментарий {number}'
+            )
+
+    def setUp(self):
+        self.client = Client()
+        self.kwargs = {
+            'username': self.author.username,
+            'post_id': self.post.id,
+        }
+
+    def texts(self, comments):
+        return [comment.text for comment in comments]
+
+    @override_settings(PAG_COMMENTS=3)
+    def test_post_shows_first_comments_chunk(self):
+        response = self.client.get(reverse('post', kwargs=self.kwargs))
+        comments = response.context['comments']
+        self.assertEqual(
+            self.texts(comments),
+            ['Комментарий 0', 'Комментарий 1', 'Комментарий 2'],
+        )
+        self.assertContains(response, 'Показать ещё')
+
+    @override_settings(PAG_COMMENTS=3)
+    def test_fragment_loads_next_chunks(self):
+        url = reverse('post_comments', kwargs=self.kwargs)
+        cursor = self.client.get(
+            reverse('post', kwargs=self.kwargs)
+        ).context['comments'].next_cursor
+        response = self.client.get(url, {'cursor': cursor})
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertTemplateNotUsed(response, 'includes/post_body.html')
+        comments = response.context['comments']
+        self.assertEqual(
+            self.texts(comments),
+            ['Комментарий 3', 'Комментарий 4', 'Комментарий 5'],
+        )
+        response = self.client.get(url, {'cursor': comments.next_cursor})
+        self.assertEqual(
+            self.texts(response.context['comments']), ['Комментарий 6']
+        )
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_fragment_queries_do_not_depend_on_chunk_size(self):
+        url = reverse('post_comments', kwargs=self.kwargs)
+        counts = []
+        for per_page in (2, 7):
+            with override_settings(PAG_COMMENTS=per_page):
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(url)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_fragment_of_missing_post(self):
+        response = self.client.get(reverse('post_comments', kwargs={
+            'username': 'nobody',
+            'post_id': self.post.id,
+        }))
+        self.assertEqual(response.status_code, 404)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='follower')
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_new_post_and_comment_update_counters(self):
+        self.authorized_client.post(reverse('new_post'), {'text': 'Пост'})
+        post = Post.objects.get(author=self.user)
+        self.authorized_client.post(
+            reverse('add_comment', kwargs={
+                'username': self.user.username,
+                'post_id': post.id,
+            }),
+            {'text': 'Комментарий'},
+        )
+        post.refresh_from_db()
+        self.user.stats.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.user.stats.post_count, 1)
+
+        post.comments.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+
+    def test_follow_and_unfollow_update_counters(self):
+        self.authorized_client.get(
+            reverse('profile_follow', kwargs={'username': self.author})
+        )
+        self.authorized_client.get(
+            reverse('profile_follow', kwargs={'username': self.author})
+        )
+        self.user.stats.refresh_from_db()
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.following_count, 1)
+        self.assertEqual(self.author.stats.follower_count, 1)
+
+        self.authorized_client.get(
+            reverse('profile_unfollow', kwargs={'username': self.author})
+        )
+        self.user.stats.refresh_from_db()
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.user.stats.following_count, 0)
+        self.assertEqual(self.author.stats.follower_count, 0)
+
+    def test_profile_uses_stored_counters(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        recount_all()
+        response = self.authorized_client.get(
+            reverse('profile', kwargs={'username': self.author.username})
+        )
+        self.assertContains(response, 'Подписчиков: 1')
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def follow_page(self):
+        response = self.authorized_client.get(reverse('follow_index'))
+        return list(response.context['page'])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        self.authorized_client.get(
+            reverse('profile_follow', kwargs={'username': self.author})
+        )
+        self.assertEqual(self.follow_page(), [self.old_post])
+
+        self.authorized_client.get(
+            reverse('profile_unfollow', kwargs={'username': self.author})
+        )
+        self.assertEqual(self.follow_page(), [])
+        self.assertFalse(TimelineEntry.objects.filter(user=self.user))
+
+    def test_new_post_fans_out_to_followers(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=new_post)
+        )
+        self.assertEqual(self.follow_page(), [new_post, self.old_post])
+
+    def test_fan_out_and_backfill_cross_sqlite_batch_limit(self):
+        """Больше 500 строк за раз: SQLite не принимает такой INSERT."""
+        User.objects.bulk_create(
+            User(username=f'fan{number}') for number in range(600)
+        )
+        followers = User.objects.filter(username__startswith='fan')
+        Follow.objects.bulk_create(
+            Follow(user=follower, author=self.author)
+            for follower in followers
+        )
+        post = Post.objects.create(author=self.author, text='Всем')
+        self.assertEqual(
+            TimelineEntry.objects.filter(post=post).count(), 600
+        )
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Архив {number}')
+            for number in range(600)
+        )
+        self.authorized_client.get(
+            reverse('profile_follow', kwargs={'username': self.author})
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), 602
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0, PAG_POSTS=2)
+    def test_celebrity_posts_are_merged_on_read(self):
+        """Посты крупных авторов подмешиваются в ленту при чтении."""
+        self.authorized_client.get(
+            reverse('profile_follow', kwargs={'username': self.author})
+        )
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+            for number in range(2)
+        ]
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.user, post__in=posts
+        ))
+        response = self.authorized_client.get(reverse('follow_index'))
+        page = response.context['page']
+        self.assertEqual(list(page), posts[::-1])
+        response = self.authorized_client.get(
+            reverse('follow_index') + f'?cursor={page.next_cursor}'
+        )
+        self.assertEqual(list(response.context['page']), [self.old_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_posts_reach_timeline_when_author_drops_to_limit(self):
+        """Посты, написанные автором выше предела, не теряются из ленты."""
+        other = User.objects.create_user(username='other_reader')
+        other_client = Client()
+        other_client.force_login(other)
+        for client in (self.authorized_client, other_client):
+            client.get(
+                reverse('profile_follow', kwargs={'username': self.author})
+            )
+        post = Post.objects.create(author=self.author, text='Крупный')
+        self.assertFalse(TimelineEntry.objects.filter(post=post))
+        other_client.get(
+            reverse('profile_unfollow', kwargs={'username': self.author})
+        )
+        self.assertEqual(self.follow_page(), [post, self.old_post])
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.user, post=post)
+        )
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(title='Группа', slug='cached')
+        cls.user = User.objects.create_user(username='cached_author')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            group=cls.group,
+            text='Первый пост',
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        self.urls = (
+            reverse('index'),
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user.username}),
+        )
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный запрос анонима отдаётся из кеша без рендеринга."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertIsNotNone(self.guest_client.get(url).context)
+                response = self.guest_client.get(url)
+                self.assertIsNone(response.context)
+                self.assertContains(response, 'Первый пост')
+
+    def test_authorized_pages_are_not_cached(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.authorized_client.get(url)
+                response = self.authorized_client.get(url)
+                self.assertIsNotNone(response.context)
+
+    def test_new_post_and_edit_invalidate_cache(self):
+        for url in self.urls:
+            self.guest_client.get(url)
+        Post.objects.create(
+            author=self.user,
+            group=self.group,
+            text='Второй пост',
+        )
+        self.authorized_client.post(
+            reverse('post_edit', kwargs={
+                'username': self.user.username,
+                'post_id': self.post.id,
+            }),
+            {'text': 'Исправленный пост', 'group': self.group.id},
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertContains(response, 'Второй пост')
+                self.assertContains(response, 'Исправленный пост')
+
+    def test_group_change_invalidates_old_group(self):
+        group_url = self.urls[1]
+        self.guest_client.get(group_url)
+        self.post.group = None
+        self.post.save()
+        response = self.guest_client.get(group_url)
+        self.assertNotContains(response, 'Первый пост')
+
+    def test_new_comment_invalidates_cache(self):
+        self.guest_client.get(self.urls[0])
+        self.authorized_client.post(
+            reverse('add_comment', kwargs={
+                'username': self.user.username,
+                'post_id': self.post.id,
+            }),
+            {'text': 'Комментарий'},
+        )
+        response = self.guest_client.get(self.urls[0])
+        self.assertContains(response, 'Комментариев: 1')
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='card_author')
+        cls.reader = User.objects.create_user(username='card_reader')
+        cls.post = Post.objects.create(author=cls.author, text='Карточка')
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.edit_url = reverse('post_edit', kwargs={
+            'username': self.author.username,
+            'post_id': self.post.id,
+        })
+
+    def test_card_is_cached_and_shared(self):
+        """Карточка из кеша общая, кнопка редактирования — только автору."""
+        self.assertContains(self.author_client.get('/'), self.edit_url)
+        key = make_template_fragment_key('post_card_head', [
+            self.post.pk, self.post.modified, self.post.comment_count, '',
+            self.author.username, '', '',
+        ])
+        self.assertIsNotNone(cache.get(key))
+        self.assertNotContains(self.reader_client.get('/'), self.edit_url)
+        self.assertContains(self.author_client.get('/'), self.edit_url)
+
+    @override_settings(POST_CARD_CACHE_TIMEOUT=0)
+    def test_card_timeout_comes_from_settings(self):
+        self.reader_client.get('/')
+        key = make_template_fragment_key('post_card_tail', [
+            self.post.pk, self.post.modified,
+        ])
+        self.assertIsNone(cache.get(key))
+
+    def test_edit_and_comment_refresh_card(self):
+        self.reader_client.get('/')
+        self.author_client.post(self.edit_url, {'text': 'Новый текст'})
+        self.reader_client.post(
+            reverse('add_comment', kwargs={
+                'username': self.author.username,
+                'post_id': self.post.id,
+            }),
+            {'text': 'Комментарий'},
+        )
+        response = self.reader_client.get('/')
+        self.assertContains(response, 'Новый текст')
+        self.assertContains(response, 'Комментариев: 1')
+
+    def test_group_and_author_renames_refresh_card(self):
+        group = Group.objects.create(title='Старое название', slug='old')
+        Post.objects.filter(pk=self.post.pk).update(group=group)
+        self.assertContains(self.reader_client.get('/'), 'Старое название')
+        etag = self.client.get('/')['ETag']
+        group.title = 'Новое название'
+        group.save()
+        author = User.objects.get(pk=self.author.pk)
+        author.username = 'renamed_author'
+        author.save()
+        response = self.reader_client.get('/')
+        self.assertContains(response, 'Новое название')
+        self.assertContains(response, '@renamed_author')
+        self.assertEqual(
+            self.client.get('/', HTTP_IF_NONE_MATCH=etag).status_code, 200
+        )
+
+
+@override_settings(POST_EXCERPT_CHARS=20, POST_EXCERPT_LINES=3)
+class PostExcerptTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='long_author')
+        cls.long_post = Post.objects.create(
+            author=cls.author,
+            text='Начало длинного поста <b>' + ' слово' * 100 + ' конец',
+        )
+        cls.short_post = Post.objects.create(
+            author=cls.author, text='Короткий\nпост'
+        )
+        cls.long_url = reverse('post', kwargs={
+            'username': cls.author.username,
+            'post_id': cls.long_post.id,
+        })
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feed_shows_excerpt_with_link(self):
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Начало длинного…')
+        self.assertNotContains(response, 'конец')
+        self.assertContains(response, 'Читать дальше', count=1)
+        self.assertContains(response, self.long_url)
+        self.assertContains(response, 'Короткий<br>пост')
+
+    def test_post_page_shows_full_text(self):
+        response = self.client.get(self.long_url)
+        self.assertContains(response, 'поста &lt;b&gt;')
+        self.assertContains(response, 'конец')
+        self.assertNotContains(response, 'Читать дальше')
+
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def make_image(name='image.png', size=(50, 50)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (255, 0, 0)).save(buffer, 'png')
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(title='Группа', slug='etag')
+        cls.author = User.objects.create_user(username='etag_author')
+        cls.reader = User.objects.create_user(username='etag_reader')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.post_url = reverse('post', kwargs={
+            'username': self.author.username,
+            'post_id': self.post.id,
+        })
+        self.feed_urls = (
+            reverse('index'),
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+        )
+
+    def revalidate(self, client, url):
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_pages_answer_304_without_rendering(self):
+        for url in self.feed_urls + (self.post_url,):
+            for client in (self.client, self.reader_client):
+                with self.subTest(url=url, client=client):
+                    response = self.revalidate(client, url)
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response.templates, [])
+
+    def test_validators_differ_per_user(self):
+        for url in self.feed_urls + (self.post_url,):
+            with self.subTest(url=url):
+                self.assertNotEqual(
+                    self.client.get(url)['ETag'],
+                    self.reader_client.get(url)['ETag'],
+                )
+
+    def test_changes_invalidate_validators(self):
+        """Новый пост, правка и комментарий меняют ETag страниц."""
+        every_page = self.feed_urls + (self.post_url,)
+        changes = (
+            (lambda: Post.objects.create(
+                author=self.author, group=self.group, text='Ещё пост'
+            ), self.feed_urls),
+            (lambda: Post.objects.get(pk=self.post.pk).save(), every_page),
+            (lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Ок'
+            ), every_page),
+        )
+        for change, urls in changes:
+            etags = {url: self.client.get(url)['ETag'] for url in urls}
+            change()
+            for url, etag in etags.items():
+                with self.subTest(url=url):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                    self.assertEqual(response.status_code, 200)
+
+    def test_changes_in_other_process_invalidate_validators(self):
+        """Версии лент общие для процессов с отдельным локальным кешем."""
+        every_page = self.feed_urls + (self.post_url,)
+        etags = {url: self.client.get(url)['ETag'] for url in every_page}
+        other_process = {'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'other-process',
+        }}
+        with override_settings(CACHES=other_process):
+            Post.objects.get(pk=self.post.pk).save()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+        etags = {url: self.client.get(url)['ETag'] for url in every_page}
+        bump_all_feeds()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_post_last_modified_for_anonymous(self):
+        response = self.client.get(self.post_url)
+        last_modified = response['Last-Modified']
+        response = self.client.get(
+            self.post_url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(
+            self.reader_client.get(self.post_url).has_header('Last-Modified')
+        )
+
+    def test_missing_pages_have_no_validators(self):
+        response = self.client.get(
+            reverse('group', kwargs={'slug': 'missing'})
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
+
+
+class ThumbnailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=make_image(),
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_placeholder_until_thumbnail_is_generated(self):
+        """Пока миниатюры нет, карточка показывает заглушку."""
+        response = self.client.get(reverse('post', kwargs={
+            'username': self.user.username,
+            'post_id': self.post.id,
+        }))
+        self.assertContains(response, 'card-img bg-light')
+        self.assertIsNone(thumbnails.get_cached(self.post.image))
+
+        self.assertTrue(thumbnails.generate(self.post.image.name))
+        self.assertFalse(thumbnails.generate(self.post.image.name))
+        thumbnail = thumbnails.get_cached(self.post.image)
+        response = self.client.get(reverse('post', kwargs={
+            'username': self.user.username,
+            'post_id': self.post.id,
+        }))
+        self.assertContains(response, thumbnail.url)
+        self.assertEqual(list(thumbnail.size), [960, 339])
+
+    def test_picture_with_responsive_sources(self):
+        thumbnails.generate(self.post.image.name)
+        sources = thumbnails.get_cached_sources(self.post.image)
+        self.assertEqual(
+            [source['type'] for source in sources],
+            [content_type for _, content_type
+             in thumbnails.variant_formats()],
+        )
+        self.assertIn('image/webp', [source['type'] for source in sources])
+        for source in sources:
+            widths = [
+                candidate.split()[1]
+                for candidate in source['srcset'].split(', ')
+            ]
+            self.assertEqual(widths, ['320w', '640w', '960w'])
+        response = self.client.get(reverse('post', kwargs={
+            'username': self.user.username,
+            'post_id': self.post.id,
+        }))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, sources[0]['srcset'])
+        self.assertContains(
+            response, 'width="960" height="339" loading="lazy"'
+        )
+
+    def test_sources_are_added_for_existing_thumbnails(self):
+        """Для старых постов generate() досоздаёт только варианты."""
+        default.backend.get_thumbnail(
+            self.post.image.name, thumbnails.GEOMETRY, **thumbnails.OPTIONS
+        )
+        self.assertIsNone(thumbnails.get_cached_sources(self.post.image))
+        self.assertTrue(thumbnails.generate(self.post.image.name))
+        self.assertIsNotNone(thumbnails.get_cached_sources(self.post.image))
+        self.assertFalse(thumbnails.generate(self.post.image.name))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='exporter')
+        cls.other = User.objects.create_user(username='other')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Мой пост', image=make_image('export.png')
+        )
+        Post.objects.create(
+            author=cls.user, text='Повтор', image=make_image('again.png')
+        )
+        Post.objects.create(author=cls.other, text='Чужой пост')
+        Comment.objects.create(post=cls.post, author=cls.other, text='Чужой')
+        Follow.objects.create(user=cls.user, author=cls.other)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_export_requires_login(self):
+        response = Client().get(reverse('export'))
+        self.assertEqual(response.status_code, 302)
+
+    def test_export_streams_own_data_and_images(self):
+        response = self.authorized_client.get(reverse('export'))
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        bundle = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        posts = [
+            json.loads(line)
+            for line in bundle.read('posts.ndjson').decode().splitlines()
+        ]
+        self.assertEqual(
+            [post['text'] for post in posts], ['Мой пост', 'Повтор']
+        )
+        self.assertEqual(bundle.namelist().count(self.post.image.name), 1)
+        self.assertEqual(bundle.read('comments.ndjson'), b'')
+        self.assertEqual(
+            json.loads(bundle.read('follows.ndjson')),
+            {'user': 'exporter', 'author': 'other'},
+        )
+        self.assertEqual(
+            bundle.read(self.post.image.name), self.post.image.read()
+        )
@@ -0,0 +1,67 @@
+"""
+Готовый HTML текста поста.
+
+Экранирование и замена переносов на <br> выполняются один раз при
+сохранении, а не при каждом показе. Лента показывает только начало
+длинного поста (excerpt) со ссылкой на страницу поста, поэтому в карточку
+не попадают мегабайты текста.
+"""
+from django.apps import apps as global_apps
+from django.conf import settings
+from django.template.defaultfilters import linebreaksbr
+
+RENDERED_FIELDS = ('text_html', 'excerpt', 'truncated')
+
+
+def render(text):
+    return linebreaksbr(text, autoescape=True)
+
+
+def head(text):
+    """
+    Начало текста не длиннее POST_EXCERPT_CHARS символов
+    и POST_EXCERPT_LINES строк, обрезанное по границе слова.
+    """
+    lines = text.split('\n', settings.POST_EXCERPT_LINES)
+    result = '\n'.join(lines[:settings.POST_EXCERPT_LINES])
+    limit = settings.POST_EXCERPT_CHARS
+    if len(result) > limit:
+        cut = result[:limit]
+        # Слово, разрезанное на границе, отбрасываем целиком.
+        if not result[limit].isspace():
+            cut = cut.rsplit(None, 1)[0] if cut.strip() else cut
+        result = cut
+    return result.rstrip()
+
+
+def render_post(post):
+    """Заполняет text_html, excerpt и truncated по post.text."""
+    text = post.text or ''
+    excerpt = head(text)
+    post.truncated = len(excerpt) < len(text.rstrip())
+    post.text_html = render(text)
+    post.excerpt = render(excerpt + '…') if post.truncated else post.text_html
+
+
+def render_all(apps=global_apps, batch_size=500, stale_only=False):
+    """
+    Перестраивает HTML постов пачками по batch_size через bulk_update.
+
+    Принимает реестр моделей, чтобы работать и из миграций. Возвращает
+    число обновлённых постов.
+    """
+    post_model = apps.get_model('posts', 'Post')
+    queryset = post_model.objects.order_by('pk').only('pk', 'text')
+    if stale_only:
+        queryset = queryset.filter(text_html='').exclude(text='')
+    last = 0
+    total = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last)[:batch_size])
+        if not batch:
+            return total
+        for post in batch:
+            render_post(post)
+        post_model.objects.bulk_update(batch, RENDERED_FIELDS)
+        last = batch[-1].pk
+        total += len(batch)
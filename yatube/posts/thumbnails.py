@@ -0,0 +1,290 @@
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+from PIL import Image
+from sorl.thumbnail import base, default
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.helpers import tokey
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+from sorl.thumbnail.parsers import parse_geometry
+
+from .cache import bump_feed, bump_post_feeds
+from .models import Post
+from .storage import write_addressed
+
+try:
+    # Регистрирует AVIF в Pillow, где его нет из коробки.
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+logger = logging.getLogger(__name__)
+
+# Размер и параметры миниатюры карточки поста (includes/post_body.html)
+GEOMETRY = '960x339'
+OPTIONS = {'crop': 'center', 'upscale': True}
+# Ширины вариантов для srcset с теми же пропорциями, что у GEOMETRY
+VARIANT_WIDTHS = (320, 640, 960)
+# Форматы вариантов в порядке предпочтения браузером: AVIF есть в Pillow
+# начиная с 11.2 или с pillow-avif-plugin, WebP — почти в любой сборке
+VARIANT_FORMATS = (('AVIF', 'image/avif'), ('WEBP', 'image/webp'))
+VARIANT_QUALITY = {'AVIF': 60, 'WEBP': 80}
+# Каталог миниатюр с именами из хеша содержимого: файл по такому адресу
+# никогда не меняется, и media-вьюха кеширует его как immutable
+CONTENT_PREFIX = 'thumbs/'
+
+_executor = None
+
+
+class ThumbnailBackend(base.ThumbnailBackend):
+    """Бэкенд sorl, умеющий вернуть миниатюру без её генерации."""
+
+    def _options(self, source, options):
+        # Та же подготовка параметров, что и в get_thumbnail(),
+        # чтобы имя файла миниатюры совпало.
+        options = dict(options)
+        if base.settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(base.settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        return options
+
+    def get_cached_thumbnail(self, file_, geometry_string, **options):
+        source = ImageFile(file_)
+        options = self._options(source, options)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return default.kvstore.get(ImageFile(name, default.storage))
+
+    def _create_thumbnail(self, source_image, geometry_string, options,
+                          thumbnail):
+        """
+        Сохраняет миниатюру под именем из хеша её содержимого.
+
+        thumbnail остаётся под именем из исходника и параметров: под его
+        ключом KVStore запишет адресованный файл.
+        """
+        ratio = default.engine.get_image_ratio(source_image, options)
+        geometry = parse_geometry(geometry_string, ratio)
+        image = default.engine.create(source_image, geometry, options)
+        data = default.engine._get_raw_data(
+            image, options['format'], options['quality'],
+            image_info=options.get('image_info', {}),
+            progressive=options.get(
+                'progressive', base.settings.THUMBNAIL_PROGRESSIVE
+            ),
+        )
+        name = _save_addressed(data, os.path.splitext(thumbnail.name)[1])
+        size = default.engine.get_image_size(image)
+        thumbnail.set_size(size)
+        thumbnail.addressed = ImageFile(name, default.storage)
+        thumbnail.addressed.set_size(size)
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        thumbnail = super().get_thumbnail(file_, geometry_string, **options)
+        return getattr(thumbnail, 'addressed', thumbnail)
+
+
+def _save_addressed(data, extension):
+    """Кладёт файл под имя из хеша содержимого, если его ещё нет."""
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    return write_addressed(
+        default.storage, f'{CONTENT_PREFIX}{digest[:2]}/{digest}{extension}',
+        data,
+    )
+
+
+class KVStore(cached_db_kvstore.KVStore):
+    """Хранилище ключей, где миниатюра записывается адресованным файлом."""
+
+    def _set(self, key, value, identity='image'):
+        if identity == 'image':
+            value = getattr(value, 'addressed', value)
+        super()._set(key, value, identity)
+
+
+def _name(image):
+    # Ключи sorl зависят от класса хранилища исходника, поэтому и поле
+    # модели, и имя из generate() приводятся к имени файла.
+    return getattr(image, 'name', image)
+
+
+def get_cached(image):
+    """Готовая миниатюра карточки или None, пока она не сгенерирована."""
+    if not image:
+        return None
+    return default.backend.get_cached_thumbnail(
+        _name(image), GEOMETRY, **OPTIONS
+    )
+
+
+def variant_formats():
+    """Форматы вариантов, которые умеет сохранять Pillow, по предпочтению."""
+    Image.init()
+    return [
+        (image_format, content_type)
+        for image_format, content_type in VARIANT_FORMATS
+        if image_format in Image.SAVE
+    ]
+
+
+def _variants_key(image):
+    source = ImageFile(_name(image))
+    formats = ','.join(image_format for image_format, _ in variant_formats())
+    return tokey(source.key, GEOMETRY, str(VARIANT_WIDTHS), formats)
+
+
+def get_cached_sources(image):
+    """
+    Готовые варианты для <source> в <picture>: список словарей с type
+    и srcset. None, пока они не сгенерированы.
+    """
+    if not image:
+        return None
+    sources = default.kvstore._get(_variants_key(image), identity='variants')
+    if sources is None:
+        return None
+    return [
+        {
+            'type': source['type'],
+            'srcset': ', '.join(
+                f'{default.storage.url(name)} {width}w'
+                for name, width in source['srcset']
+            ),
+        }
+        for source in sources
+    ]
+
+
+def generate_sources(name):
+    """
+    Сохраняет варианты ширин VARIANT_WIDTHS во всех доступных форматах.
+
+    Исходник декодируется один раз, каждая ширина масштабируется один раз
+    и кодируется в каждый формат. В хранилище ключей — одна запись на
+    исходник с именами файлов и их шириной.
+    """
+    source = ImageFile(name)
+    formats = variant_formats()
+    sources = {image_format: [] for image_format, _ in formats}
+    source_image = default.engine.get_image(source)
+    try:
+        width, height = parse_geometry(GEOMETRY)
+        for variant_width in VARIANT_WIDTHS:
+            geometry = (variant_width, round(height * variant_width / width))
+            options = default.backend._options(source, OPTIONS)
+            image = default.engine.create(source_image, geometry, options)
+            size = default.engine.get_image_size(image)
+            for image_format, _ in formats:
+                data = default.engine._get_raw_data(
+                    image, image_format, VARIANT_QUALITY[image_format],
+                    image_info={},
+                )
+                variant = _save_addressed(data, '.' + image_format.lower())
+                sources[image_format].append((variant, size[0]))
+    finally:
+        default.engine.cleanup(source_image)
+    default.kvstore._set(
+        _variants_key(source.name),
+        [
+            {'type': content_type, 'srcset': sources[image_format]}
+            for image_format, content_type in formats
+        ],
+        identity='variants',
+    )
+
+
+def delete(name):
+    """
+    Забывает миниатюру и варианты исходника name и удаляет их файлы,
+    если те же файлы не достались другим исходникам.
+    """
+    kvstore = default.kvstore
+    source = ImageFile(name)
+    names = set()
+    for key in kvstore._get(source.key, identity='thumbnails') or []:
+        thumbnail = kvstore._get(key)
+        if thumbnail is not None:
+            names.add(thumbnail.name)
+        kvstore._delete(key)
+    variants_key = _variants_key(name)
+    for variants in kvstore._get(variants_key, identity='variants') or []:
+        names.update(variant for variant, _ in variants['srcset'])
+    kvstore._delete(variants_key, identity='variants')
+    kvstore._delete(source.key, identity='thumbnails')
+    kvstore._delete(source.key)
+    for thumbnail in names:
+        # Одинаковая миниатюра может получиться из разных исходников.
+        if not KVStoreModel.objects.filter(
+            value__contains=f'"{thumbnail}"'
+        ).exists():
+            default.storage.delete(thumbnail)
+
+
+def generate(name):
+    """
+    Создаёт миниатюру и её варианты, если их ещё нет. Возвращает True,
+    если что-то создал.
+    """
+    created = False
+    if get_cached(name) is None:
+        default.backend.get_thumbnail(name, GEOMETRY, **OPTIONS)
+        created = True
+    if get_cached_sources(name) is None:
+        generate_sources(name)
+        created = True
+    if created:
+        _refresh_pages(name)
+    return created
+
+
+def _refresh_pages(name):
+    """Страницы с заглушкой вместо миниатюры пора отдать заново."""
+    posts = Post.objects.filter(image=name).values_list(
+        'pk', 'author__username', 'group__slug'
+    )
+    for pk, username, slug in posts:
+        bump_post_feeds(username, slug)
+        bump_feed('post', pk)
+
+
+def _generate_in_thread(name):
+    try:
+        generate(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюру %s', name)
+    finally:
+        # У каждого потока своё соединение с базой: закрываем его сами.
+        connection.close()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+    return _executor
+
+
+def schedule(post):
+    """Ставит генерацию миниатюры в очередь после коммита транзакции."""
+    if not post.image:
+        return
+    name = post.image.name
+    if not settings.THUMBNAIL_WORKERS:
+        transaction.on_commit(lambda: generate(name))
+        return
+    transaction.on_commit(
+        lambda: _get_executor().submit(_generate_in_thread, name)
+    )
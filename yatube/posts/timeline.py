@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.db import connection
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+
+def is_celebrity(author_id):
+    """Автор, чьи посты подмешиваются в ленту при чтении, а не при записи."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        follower_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).exists()
+
+
+def fan_out(post):
+    if is_celebrity(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    # Размер пачки выбирает Django: явный batch_size в Django 2.2
+    # не урезается до предела SQLite в 500 строк на INSERT.
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    if is_celebrity(author_id):
+        return
+    posts = Post.objects.filter(
+        author_id=author_id
+    ).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts.iterator()),
+        ignore_conflicts=True,
+    )
+
+
+def fill_all():
+    """
+    Дописывает недостающие записи во все ленты одним INSERT ... SELECT.
+
+    Для загрузок через bulk_create, после которых сигналы fan_out
+    и backfill не срабатывали. Возвращает число добавленных записей.
+    """
+    return _fill('', [])
+
+
+def fill_author(author_id):
+    """Дописывает посты автора в ленты всех его подписчиков."""
+    return _fill('AND f.author_id = %s ', [author_id])
+
+
+def follower_left(author_id):
+    """
+    Автор, у которого подписчиков снова не больше TIMELINE_FANOUT_LIMIT,
+    перестаёт подмешиваться при чтении: его посты, не попавшие в ленты,
+    пока он был крупным, дописываются сразу.
+    """
+    if UserStats.objects.filter(
+        user_id=author_id,
+        follower_count=settings.TIMELINE_FANOUT_LIMIT
+    ).exists():
+        fill_author(author_id)
+
+
+def _fill(condition, params):
+    sql = (
+        f'INSERT INTO {TimelineEntry._meta.db_table} '
+        f'(user_id, post_id, pub_date) '
+        f'SELECT f.user_id, p.id, p.pub_date '
+        f'FROM {Follow._meta.db_table} f '
+        f'JOIN {Post._meta.db_table} p ON p.author_id = f.author_id '
+        f'JOIN {UserStats._meta.db_table} s ON s.user_id = f.author_id '
+        f'WHERE s.follower_count <= %s {condition}'
+        f'ON CONFLICT DO NOTHING'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [settings.TIMELINE_FANOUT_LIMIT, *params])
+        return cursor.rowcount
+
+
+def prune(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+
+
+def entries_for(user):
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    ).defer('post__text', 'post__text_html')
+
+
+def celebrity_posts_for(user):
+    """Посты крупных авторов из подписок или None, если таких нет."""
+    authors = list(Follow.objects.filter(
+        user=user,
+        author__stats__follower_count__gt=settings.TIMELINE_FANOUT_LIMIT
+    ).values_list('author_id', flat=True))
+    if not authors:
+        return None
+    return Post.objects.for_feed().filter(author_id__in=authors)
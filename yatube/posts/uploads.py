@@ -0,0 +1,129 @@
+"""
+Проверка и уменьшение картинок, загруженных через PostForm.
+
+Размеры читаются из заголовка файла до декодирования, поэтому файл
+с огромным числом пикселей отклоняется, не заняв память. Картинка больше,
+чем её когда-либо показывает карточка, уменьшается перед сохранением:
+JPEG декодируется сразу в уменьшенном виде (draft: масштаб 1/2–1/8 прямо
+в декодере), остальные форматы — целиком, поэтому для них действует
+отдельный, меньший предел пикселей.
+"""
+import math
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, ImageOps
+
+from .thumbnails import GEOMETRY, VARIANT_WIDTHS
+
+# Значения EXIF Orientation, при которых картинка поворачивается на 90°
+ROTATED = {5, 6, 7, 8}
+EXIF_ORIENTATION = 0x0112
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 90, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 90},
+}
+
+
+def display_size(width, height):
+    """
+    Наименьший размер с пропорциями width x height, из которого получаются
+    все миниатюры без увеличения, или None, если картинка не больше него.
+    """
+    box_width, box_height = (int(value) for value in GEOMETRY.split('x'))
+    box_width = max(box_width, *VARIANT_WIDTHS)
+    scale = max(box_width / width, box_height / height)
+    if scale >= 1:
+        return None
+    return math.ceil(width * scale), math.ceil(height * scale)
+
+
+def _oriented_size(image):
+    width, height = image.size
+    if image.getexif().get(EXIF_ORIENTATION) in ROTATED:
+        return height, width
+    return width, height
+
+
+def _too_many_pixels(limit):
+    return ValidationError(
+        'Слишком большая картинка: не больше %(limit)d Мпикс.',
+        code='too_many_pixels',
+        params={'limit': limit // 10 ** 6},
+    )
+
+
+def check(upload):
+    """
+    Проверяет размер файла и число пикселей по заголовку.
+
+    Возвращает открытую, но не декодированную картинку.
+    """
+    if upload.size > settings.IMAGE_MAX_BYTES:
+        raise ValidationError(
+            'Файл больше %(limit)d МиБ.',
+            code='file_too_big',
+            params={'limit': settings.IMAGE_MAX_BYTES // 2 ** 20},
+        )
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except Image.DecompressionBombError:
+        raise _too_many_pixels(settings.IMAGE_MAX_PIXELS)
+    width, height = image.size
+    limit = (
+        settings.IMAGE_MAX_PIXELS if image.format == 'JPEG'
+        else settings.IMAGE_MAX_DECODE_PIXELS
+    )
+    if width * height > limit:
+        raise _too_many_pixels(limit)
+    return image
+
+
+def downscale(upload, image):
+    """
+    Уменьшает картинку до display_size() в том же формате.
+
+    Возвращает новый файл или None, если уменьшать не нужно. Анимация
+    не трогается: кадры пришлось бы пересобирать все.
+    """
+    if getattr(image, 'is_animated', False):
+        return None
+    target = display_size(*_oriented_size(image))
+    if target is None:
+        return None
+    image_format = image.format
+    if image_format == 'JPEG':
+        width, height = target
+        if image.size != _oriented_size(image):
+            width, height = height, width
+        image.draft(image.mode, (width, height))
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('1', 'P'):
+        image = image.convert('RGBA' if 'transparency' in image.info
+                              else 'RGB')
+    image = image.resize(target, Image.LANCZOS, reducing_gap=3.0)
+    buffer = BytesIO()
+    options = dict(SAVE_OPTIONS.get(image_format, {}))
+    if 'icc_profile' in image.info:
+        options['icc_profile'] = image.info['icc_profile']
+    image.save(buffer, image_format, **options)
+    return SimpleUploadedFile(
+        os.path.basename(upload.name),
+        buffer.getvalue(),
+        upload.content_type,
+    )
+
+
+def prepare(upload):
+    """Проверенный и, если нужно, уменьшенный файл для Post.image."""
+    # image не закрываем: Pillow закрыл бы и сам файл загрузки.
+    image = check(upload)
+    try:
+        return downscale(upload, image) or upload
+    finally:
+        upload.seek(0)
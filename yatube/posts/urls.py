@@ -1,17 +1,34 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group'),
     path('new/', views.new_post, name='new_post'),
     path('follow/', views.follow_index, name="follow_index"),
+    path('search/', views.search, name='search'),
+    path('export/', views.export_data, name='export'),
+    path('api/v1/posts/', api.posts, name='api_posts'),
+    path('api/v1/posts/<int:post_id>/', api.post_detail, name='api_post'),
+    path('api/v1/posts/<int:post_id>/comments/',
+         api.post_comments,
+         name='api_post_comments'),
+    path('api/v1/groups/<slug:slug>/posts/',
+         api.group_posts,
+         name='api_group_posts'),
+    path('api/v1/users/<str:username>/posts/',
+         api.profile_posts,
+         name='api_profile_posts'),
+    path('api/v1/follow/', api.follow_posts, name='api_follow_posts'),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path('<str:username>/<int:post_id>/edit/',
          views.post_edit,
          name='post_edit'),
+    path('<str:username>/<int:post_id>/comments/',
+         views.post_comments,
+         name='post_comments'),
     path('<str:username>/<int:post_id>/comment/',
          views.add_comment,
          name='add_comment'),
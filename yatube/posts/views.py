@@ -1,77 +1,160 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import Http404, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-
+from django.views.decorators.http import condition
+
+from .cache import (cache_anonymous_page, feed_etag, post_etag,
+                    post_last_modified)
+from .counters import (change_comment_count, change_follow_counts,
+                       change_post_count)
+from .db import atomic_retry
+from .export import archive
 from .forms import PostForm, CommentForm
-from .models import Group, Post, User, Follow
+from .models import Comment, Group, Post, User, UserStats, Follow
+from .paginator import CommentPaginator, TimelinePaginator, get_page
+from .search import decode_search_cursor, encode_search_cursor, get_backend
+from .thumbnails import schedule
+from .timeline import celebrity_posts_for, entries_for
 
 
+@condition(etag_func=feed_etag('index'))
+@cache_anonymous_page('index')
 def index(request):
-    post_list = Post.objects.select_related('group')
-    paginator = Paginator(post_list, settings.PAG_POSTS)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.for_feed()
+    page = get_page(request, post_list)
     return render(
         request,
         'index.html',
-        {'page': page, 'paginator': paginator}
+        {'page': page, 'paginator': page.paginator}
     )
 
 
+@condition(etag_func=feed_etag('group', 'slug', 'group__slug'))
+@cache_anonymous_page('group', 'slug')
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.all()
-    paginator = Paginator(posts, settings.PAG_POSTS)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    posts = Post.objects.for_feed().filter(group=group)
+    page = get_page(request, posts)
     context = {
         'group': group,
         'posts': posts,
-        'paginator': paginator,
+        'paginator': page.paginator,
         'page': page,
     }
     return render(request, 'group.html', context)
 
 
+def search(request):
+    query = request.GET.get('q', '').strip()
+    cursor = request.GET.get('cursor')
+    after = decode_search_cursor(cursor) if cursor else None
+    results = []
+    next_cursor = None
+    if query:
+        results = get_backend().search(
+            query,
+            settings.PAG_POSTS + 1,
+            after=after,
+        )
+        if len(results) > settings.PAG_POSTS:
+            results = results[:settings.PAG_POSTS]
+            next_cursor = encode_search_cursor(results[-1])
+    context = {
+        'query': query,
+        'results': results,
+        'next_cursor': next_cursor,
+        'is_first_page': after is None,
+    }
+    return render(request, 'search.html', context)
+
+
 @login_required()
 def new_post(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
-        post.save()
+
+        def save():
+            # Попытка могла откатиться уже после INSERT: без сброса
+            # повтор стал бы UPDATE, и сигнал не разослал бы пост в ленты.
+            post.pk = None
+            post._state.adding = True
+            post.save()
+            change_post_count(post.author_id, 1)
+            schedule(post)
+
+        atomic_retry(save)
         return redirect('index')
     return render(request, 'new_post.html', {'form': form})
 
 
+@condition(etag_func=feed_etag('profile', 'username', 'author__username'))
+@cache_anonymous_page('profile', 'username')
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    author_posts = author.posts.all()
-    paginator = Paginator(author_posts, settings.PAG_POSTS)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    post_count = author.posts.count()
+    author = get_object_or_404(
+        User.objects.select_related('stats'),
+        username=username
+    )
+    stats = getattr(author, 'stats', None) or UserStats(user=author)
+    author_posts = Post.objects.for_feed().filter(author=author)
+    page = get_page(request, author_posts)
     context = {
         'author': author,
         'page': page,
-        'post_count': post_count,
+        'stats': stats,
+        'post_count': stats.post_count,
     }
     return render(request, 'profile.html', context)
 
 
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
 def post_view(request, username, post_id):
     form = CommentForm(request.POST or None)
-    post = get_object_or_404(Post, id=post_id, author__username=username)
+    # Странице поста нужен готовый HTML целиком, сырой текст — нет.
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group').defer('text'),
+        id=post_id,
+        author__username=username
+    )
     author = post.author
     context = {
         'post': post,
         'author': author,
         'form': form,
+        'comments': _comments_page(request, post.pk),
     }
     return render(request, 'post.html', context)
 
 
+def _comments_page(request, post_id):
+    comment_list = Comment.objects.filter(
+        post_id=post_id
+    ).select_related('author')
+    return get_page(
+        request,
+        comment_list,
+        CommentPaginator,
+        per_page=settings.PAG_COMMENTS
+    )
+
+
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
+def post_comments(request, username, post_id):
+    """Следующая порция комментариев без карточки поста."""
+    if not Post.objects.filter(
+        id=post_id, author__username=username
+    ).exists():
+        raise Http404
+    context = {
+        'comments': _comments_page(request, post_id),
+        'username': username,
+        'post_id': post_id,
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
 @login_required()
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, id=post_id, author__username=username)
@@ -83,7 +166,9 @@ def post_edit(request, username, post_id):
     if request.user != post.author:
         return redirect('post', username, post_id)
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            schedule(post)
         return redirect('post', username, post_id)
     return render(
         request, 'new_post.html', {'form': form, 'post': post})
@@ -97,7 +182,14 @@ def add_comment(request, username, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+
+        def save():
+            comment.pk = None
+            comment._state.adding = True
+            comment.save()
+            change_comment_count(post.pk, 1)
+
+        atomic_retry(save)
     return redirect('post', username, post_id)
 
 
@@ -111,23 +203,44 @@ def server_error(request):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, settings.PAG_POSTS)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = get_page(
+        request,
+        entries_for(request.user),
+        TimelinePaginator,
+        extra_posts=celebrity_posts_for(request.user),
+    )
     context = {
         'page': page,
-        'paginator': paginator,
+        'paginator': page.paginator,
     }
     return render(request, 'follow.html', context)
 
 
+@login_required
+def export_data(request):
+    """Zip с постами, комментариями, подписками и картинками автора."""
+    fmt = 'csv' if request.GET.get('format') == 'csv' else 'ndjson'
+    response = StreamingHttpResponse(
+        archive(request.user, fmt), content_type='application/zip'
+    )
+    response['Content-Disposition'] = (
+        'attachment; filename="yatube-export.zip"'
+    )
+    return response
+
+
+def _follow(follower, author):
+    _, created = Follow.objects.get_or_create(user=follower, author=author)
+    if created:
+        change_follow_counts(follower.pk, author.pk, 1)
+
+
 @login_required
 def profile_follow(request, username):
     follower = request.user
     user_following = get_object_or_404(User, username=username)
     if follower != user_following:
-        Follow.objects.get_or_create(user=follower, author=user_following)
+        atomic_retry(_follow, follower, user_following)
     return redirect('profile', username)
 
 
@@ -135,8 +248,8 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     follower = request.user
     user_following = get_object_or_404(User, username=username)
-    Follow.objects.filter(
-        user=follower,
-        author=user_following
-    ).delete()
+    # Счётчики уменьшает сигнал post_delete в одной транзакции с удалением.
+    atomic_retry(
+        Follow.objects.filter(user=follower, author=user_following).delete
+    )
     return redirect('profile', username)
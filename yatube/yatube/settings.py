@@ -47,6 +47,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'posts.staticfiles.StaticFilesMiddleware',
+    'posts.metrics.MetricsMiddleware',
+    'posts.routers.ReplicaPinMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -61,7 +64,7 @@ ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'posts.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -87,6 +90,70 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: YATUBE_REPLICAS=2 добавит replica1 и replica2.
+# Локально это копии SQLite, которые обновляет manage.py sync_replicas.
+DATABASE_REPLICAS = [
+    f'replica{number}'
+    for number in range(1, int(os.getenv('YATUBE_REPLICAS', 0)) + 1)
+]
+for alias in DATABASE_REPLICAS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, f'db.{alias}.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['posts.routers.PrimaryReplicaRouter']
+
+# Режим SQLite для небольших боевых узлов: YATUBE_SQLITE_TUNING=1.
+# WAL не даёт читателям ждать писателя, IMMEDIATE берёт блокировку
+# на запись в начале транзакции, а busy_timeout ждёт её вместо ошибки.
+SQLITE_TUNING = os.getenv('YATUBE_SQLITE_TUNING') == '1'
+SQLITE_PRAGMAS = {}
+if SQLITE_TUNING:
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'mmap_size': 256 * 1024 * 1024,
+        'cache_size': -64 * 1024,  # в КиБ, то есть 64 МиБ
+        'busy_timeout': 5000,
+    }
+    DATABASES['default']['ENGINE'] = 'posts.db.backends.sqlite3'
+    DATABASES['default']['OPTIONS'] = {'transaction_mode': 'IMMEDIATE'}
+
+# Сколько раз повторять запись, если база заблокирована, и пауза перед
+# первым повтором в секундах (дальше она удваивается)
+DB_WRITE_ATTEMPTS = 3
+DB_WRITE_RETRY_DELAY = 0.05
+
+# Сколько секунд после записи пользователь читает с основной базы
+REPLICA_PIN_SECONDS = 5
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'yatube',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[os.getenv('YATUBE_CACHE', 'locmem')],
+}
+
+# Сколько секунд страница ленты может отдаваться анонимам из кеша
+PAGE_CACHE_TIMEOUT = 20
+
+# Сколько секунд хранится отрендеренная карточка поста; ключ фрагмента
+# меняется при правке поста, поэтому срок может быть большим
+POST_CARD_CACHE_TIMEOUT = 24 * 60 * 60
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -122,10 +189,22 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 STATIC_URL = '/static/'
-STATIC_ROOT = os.path.join(BASE_DIR, 'static')
+# Исходники статики лежат в static/, collectstatic собирает их в
+# staticfiles/ с хешем в имени и сжатыми копиями .gz и .br
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STATICFILES_STORAGE = 'posts.staticfiles.CompressedManifestStaticFilesStorage'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Кто отправляет байты файлов из MEDIA_ROOT: '' — сам Django через
+# FileResponse, 'x-accel-redirect' — nginx (internal-локация
+# MEDIA_ACCEL_PREFIX с alias на MEDIA_ROOT), 'x-sendfile' — Apache
+MEDIA_SENDFILE = ''
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Сколько секунд браузер кеширует загруженные файлы; миниатюры с хешем
+# содержимого в имени кешируются на год
+MEDIA_MAX_AGE = 24 * 3600
 # Login
 
 LOGIN_URL = '/auth/login/'
@@ -138,3 +217,47 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PAG_POSTS = 10
+PAG_COMMENTS = 20
+# Последняя страница, доступная по старым ссылкам ?page=N
+PAG_MAX_LEGACY_PAGE = 50
+# Размер порции при выдаче ленты потоком NDJSON через API
+API_STREAM_CHUNK = 500
+# Сколько строк за раз читать из базы при выгрузке данных
+EXPORT_CHUNK = 2000
+# Сколько текста длинного поста показывать в ленте
+POST_EXCERPT_CHARS = 600
+POST_EXCERPT_LINES = 12
+
+# Пределы для картинок постов. Размеры проверяются по заголовку файла;
+# JPEG уменьшается прямо при декодировании, остальные форматы декодируются
+# целиком (около 4 байт на пиксель), поэтому для них предел меньше
+IMAGE_MAX_BYTES = 20 * 2 ** 20
+IMAGE_MAX_PIXELS = 50 * 10 ** 6
+IMAGE_MAX_DECODE_PIXELS = 16 * 10 ** 6
+
+# Миниатюры генерируются в фоновых потоках; 0 — сразу после коммита
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'
+THUMBNAIL_KVSTORE = 'posts.thumbnails.KVStore'
+THUMBNAIL_WORKERS = 2
+
+# Бюджеты страниц на запрос: превышение пишется в лог,
+# а при VIEW_BUDGETS_STRICT = True роняет запрос (удобно в тестах)
+VIEW_BUDGETS = {
+    'index': {'queries': 5, 'render_ms': 500},
+    'group': {'queries': 6, 'render_ms': 500},
+    'profile': {'queries': 6, 'render_ms': 500},
+    'post': {'queries': 5, 'render_ms': 500},
+    'post_comments': {'queries': 4, 'render_ms': 200},
+    'follow_index': {'queries': 6, 'render_ms': 500},
+    'api_posts': {'queries': 3},
+    'api_post': {'queries': 4},
+    'api_follow_posts': {'queries': 6},
+}
+VIEW_BUDGETS_STRICT = False
+
+# Адреса, которым доступна страница /metrics/ для Prometheus
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Авторы с большим числом подписчиков не рассылают посты в ленты
+# при публикации: их посты подмешиваются в ленту при чтении
+TIMELINE_FANOUT_LIMIT = 10000
@@ -0,0 +1,56 @@
+"""
+Настройки для боевого окружения.
+
+    DJANGO_SETTINGS_MODULE=yatube.settings_production
+
+PostgreSQL включается переменными POSTGRES_DB, POSTGRES_USER,
+POSTGRES_PASSWORD, POSTGRES_HOST и POSTGRES_PORT; без них остаётся SQLite.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import ALLOWED_HOSTS, DATABASES, SECRET_KEY
+
+DEBUG = os.getenv('YATUBE_DEBUG') == '1'
+SECRET_KEY = os.getenv('YATUBE_SECRET_KEY', SECRET_KEY)
+ALLOWED_HOSTS = os.getenv(
+    'YATUBE_ALLOWED_HOSTS', ','.join(ALLOWED_HOSTS)
+).split(',')
+
+if os.getenv('POSTGRES_DB'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.getenv('POSTGRES_DB'),
+        'USER': os.getenv('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+        'HOST': os.getenv('POSTGRES_HOST', 'localhost'),
+        'PORT': os.getenv('POSTGRES_PORT', '5432'),
+    }
+
+# Постоянные соединения: без них каждый запрос заново устанавливает
+# соединение, а для PostgreSQL это дороже самых лёгких страниц.
+CONN_MAX_AGE = int(os.getenv('YATUBE_CONN_MAX_AGE', 60))
+
+# Общий пул соединений на процесс для многопоточных WSGI-воркеров:
+# YATUBE_DB_POOL=10 — не больше 10 соединений на все потоки.
+DB_POOL_SIZE = int(os.getenv('YATUBE_DB_POOL', 0))
+DB_POOL_TIMEOUT = int(os.getenv('YATUBE_DB_POOL_TIMEOUT', 10))
+POOLED_ENGINES = {
+    'django.db.backends.sqlite3': 'posts.db.backends.sqlite3',
+    'posts.db.backends.sqlite3': 'posts.db.backends.sqlite3',
+    'django.db.backends.postgresql': 'posts.db.backends.postgresql',
+}
+
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = CONN_MAX_AGE
+    database['CONN_HEALTH_CHECKS'] = True
+    if DB_POOL_SIZE:
+        database['ENGINE'] = POOLED_ENGINES[database['ENGINE']]
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS'] = dict(
+            database.get('OPTIONS', {}),
+            pool={'max_size': DB_POOL_SIZE, 'timeout': DB_POOL_TIMEOUT},
+        )
+
+# Отдача картинок веб-сервером: x-accel-redirect (nginx) или x-sendfile
+MEDIA_SENDFILE = os.getenv('YATUBE_MEDIA_SENDFILE', '')
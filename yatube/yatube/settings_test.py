@@ -0,0 +1,10 @@
+"""
+Настройки для тестов: pytest.ini, CI и manage.py test.
+
+Тестовая база SQLite в памяти общая для потоков и блокируется целиком:
+фоновые потоки миниатюр мешали бы записи самих тестов, поэтому
+миниатюры создаются сразу после коммита.
+"""
+from .settings import *  # noqa: F401,F403
+
+THUMBNAIL_WORKERS = 0